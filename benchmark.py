@@ -0,0 +1,746 @@
+# Runs every partN (and calc_partN variant) of every day against the inputs
+# in the folder 'data' (filled by copy-inputs.py) and records wall time, CPU
+# time and peak RSS of each one as JSON.
+#
+# Each solver runs in its own fresh process, so that the peak RSS belongs to
+# that solver alone and caches (lru_cache, module globals) don't leak between
+# runs. Solvers run in parallel (-j), the ones that took longest in the last
+# run (or the baseline) first, so that the whole run takes about as long as
+# the slowest of them; results are printed as they come.
+#
+# With --imports it measures instead how long importing each module takes
+# (python -X importtime), failing when one goes over --import-budget.
+#
+# With --check the results are compared against a stored baseline (see
+# --save-baseline) and the run fails if some solver got slower or allocates
+# more than the tolerance allows.
+
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import datetime
+import functools
+import glob
+import importlib.util
+import inspect
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import signal
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DATA = os.path.join(ROOT, 'data')
+
+BASELINE = os.path.join(ROOT, 'benchmark-baseline.json')
+
+ENTRY_POINT = re.compile(r'^(calc_)?part\d\w*$')
+
+# Modules that are not solvers (tests, scripts reading stdin) or whose
+# entry points write files instead of computing answers.
+SKIP = {'day1/day1-pytest.py', 'day1/day1-unittest.py',
+        'day11/partial_sums.py', 'day13/complex.py',
+        'day19/day19-compiler.py', 'day19/day19-disassembler.py',
+        'day21/day21-compiler.py', 'day21/day21-dissasembler.py'}
+
+
+def _read(fname):
+    with open(fname, 'r') as file:
+        return file.read()
+
+
+def _lines(fname):
+    with open(fname, 'r') as file:
+        return file.readlines()
+
+
+def _parse(fname, parse):
+    with open(fname, 'r') as file:
+        return parse(file)
+
+
+# Entry points whose arguments are not just the input file name. Each one
+# maps to a list of functions (day module, input file) -> arguments, one for
+# each run. They are copied from the `__main__` block of each day.
+ARGUMENTS = {
+    'day6/day6.py': {
+        'calc_part1': [lambda day, fname: ([day.parse(line) for line in _lines(fname)],)],
+        'calc_part2': [lambda day, fname: ([day.parse(line) for line in _lines(fname)], 10000)]},
+    'day7/day7.py': {
+        'part2': [lambda day, fname: (fname, 5, lambda task: ord(task) - ord('A') + 61)]},
+    'day8/day8.py': {
+        'calc_part1': [lambda day, fname: (_parse(fname, day.parse),)],
+        'calc_part2': [lambda day, fname: (_parse(fname, day.parse),)]},
+    'day9/day9.py': {
+        'calc_part1': [lambda day, fname: (431, 70950)],
+        'calc_part2_immutable': [lambda day, fname: (431, 7095000)],
+        'calc_part2_mutable': [lambda day, fname: (431, 7095000)]},
+    'day11/day11.py': {
+        'part1': [lambda day, fname: (6392,)],
+        'part2': [lambda day, fname: (6392,)]},
+    'day12/day12.py': {
+        'part1': [lambda day, fname: (fname, 20),
+                  lambda day, fname: (fname, 50000000000)]},
+    'day13/day13.py': {
+        'calc_part1': [lambda day, fname: day.parse(fname)],
+        'calc_part2': [lambda day, fname: day.parse(fname)]},
+    'day14/day14.py': {
+        'part1': [lambda day, fname: (30121,)],
+        'part2': [lambda day, fname: ('030121',)]},
+    'day18/day18.py': {
+        'part': [lambda day, fname: (fname, 10),
+                 lambda day, fname: (fname, 1000000000)]},
+    'day20/day20.py': {
+        'part1': [lambda day, fname: (_read(fname).strip(),)],
+        'part2': [lambda day, fname: (_read(fname).strip(),)]},
+    'day22/day22.py': {
+        'risk_level': [lambda day, fname: (8112, (13, 743))],
+        'explore': [lambda day, fname: (8112, (13, 743))]},
+    'day25/day25.py': {
+        'part1': [lambda day, fname: (fname, 3)]},
+}
+
+Job = collections.namedtuple('Job', 'module function variant')
+
+
+def job_name(job):
+    name = '%s:%s' % (job.module, job.function)
+    if len(ARGUMENTS.get(job.module, {}).get(job.function, [])) > 1:
+        name += '#%d' % job.variant
+    return name
+
+
+def day_of(module):
+    return module.split('/')[0]
+
+
+def load_module(module):
+    path = os.path.join(ROOT, module)
+    name, _ = os.path.splitext(os.path.basename(path))
+    spec = importlib.util.spec_from_file_location(name, path)
+    day = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(day)
+    return day
+
+
+def argument_makers(module, function, fn):
+    explicit = ARGUMENTS.get(module, {})
+    if function in explicit:
+        return explicit[function]
+    # fname, and any tuning knobs left at their defaults
+    parameters = list(inspect.signature(fn).parameters.values())
+    if parameters and parameters[0].name == 'fname' and \
+            all(parameter.default is not parameter.empty for parameter in parameters[1:]):
+        return [lambda day, fname: (fname,)]
+    return []
+
+
+@contextlib.contextmanager
+def inside(folder):
+    # Solutions open files relative to their own folder
+    cwd = os.getcwd()
+    os.chdir(folder)
+    sys.path.insert(0, folder)
+    try:
+        yield
+    finally:
+        sys.path.remove(folder)
+        os.chdir(cwd)
+
+
+def discover_module(module):
+    with inside(os.path.join(ROOT, day_of(module))):
+        day = load_module(module)
+    jobs = []
+    explicit = ARGUMENTS.get(module, {})
+    for function, fn in vars(day).items():
+        if not inspect.isfunction(fn) or fn.__module__ != day.__name__:
+            continue
+        if not ENTRY_POINT.match(function) and function not in explicit:
+            continue
+        for variant, _ in enumerate(argument_makers(module, function, fn)):
+            jobs.append(Job(module, function, variant))
+    return jobs
+
+
+def modules(days=None):
+    found = []
+    for path in glob.glob(os.path.join(ROOT, 'day*', '*.py')):
+        module = os.path.relpath(path, ROOT).replace(os.sep, '/')
+        if module in SKIP:
+            continue
+        if days and day_of(module) not in days:
+            continue
+        found.append(module)
+    return sorted(found, key=lambda m: (int(day_of(m)[3:]), m))
+
+
+def discover(days=None):
+    jobs = []
+    for module in modules(days):
+        try:
+            jobs.extend(discover_module(module))
+        except ImportError as e:
+            print('Skipping %s: %s' % (module, e), file=sys.stderr)
+    return jobs
+
+
+def max_rss():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class Timeout(Exception):
+    pass
+
+
+def _timeout(signum, frame):
+    raise Timeout()
+
+
+# Allocation sites reported by traced runs
+ALLOC_SITES = 10
+
+# Frames of the import machinery and of tracemalloc itself aren't sites
+# (skipped once grouped by line: filtering every trace is much slower)
+NOT_SITES = {tracemalloc.__file__, '<frozen importlib._bootstrap>',
+             '<frozen importlib._bootstrap_external>'}
+
+
+def allocation_sites(snapshot, top=ALLOC_SITES):
+    sites = []
+    for stat in snapshot.statistics('lineno'):
+        frame = stat.traceback[0]
+        filename = frame.filename
+        if filename in NOT_SITES:
+            continue
+        if len(sites) == top:
+            break
+        if filename.startswith(ROOT + os.sep):
+            filename = os.path.relpath(filename, ROOT)
+        sites.append({'site': '%s:%d' % (filename, frame.lineno),
+                      'size': stat.size, 'count': stat.count})
+    return sites
+
+
+class PeakSites:
+    # Profile hook breaking down the traced memory when it reaches a new
+    # high, checked whenever a function returns: temporaries (a dict
+    # built and summed) are still alive then, even if they are gone by
+    # the end. Snapshots are only taken once memory grows by GROWTH, what
+    # they cost is kept out of the peak and only the last one is broken
+    # down into sites (filtering is slow). The hook slows calls down a lot,
+    # but the timings come from a run without tracing
+
+    GROWTH = 1.1
+
+    def __init__(self):
+        self.peak = self.size = 0
+        self.snapshot = None
+
+    def __call__(self, frame, event, arg):
+        if event != 'return' and event != 'c_return':
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        if current > self.size * self.GROWTH:
+            self.take(current, peak)
+
+    def take(self, current, peak):
+        self.peak = max(self.peak, peak)
+        self.size = current
+        self.snapshot = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+
+
+@contextlib.contextmanager
+def traced_memory(top=ALLOC_SITES):
+    # Fills the dict with the peak of traced memory and the lines that
+    # allocated most of what was alive at the highest traced memory seen
+    # when a function returned
+    memory = {}
+    sites = PeakSites()
+    previous = sys.getprofile()
+    tracemalloc.start()
+    sys.setprofile(sites)
+    try:
+        yield memory
+        sys.setprofile(previous)
+        current, peak = tracemalloc.get_traced_memory()
+        if current >= sites.size:
+            sites.take(current, peak)
+        memory['alloc_peak'] = max(sites.peak, peak)
+        memory['alloc_sites'] = allocation_sites(sites.snapshot, top)
+    finally:
+        sys.setprofile(previous)
+        tracemalloc.stop()
+
+
+def profile_memory(fn=None, *, top=ALLOC_SITES):
+    """Decorator printing the memory profile of every call to stderr.
+
+    Meant for a quick look at one solver (@profile_memory on a partN);
+    benchmark.py --alloc stores the same profile for every solver."""
+    if fn is None:
+        return functools.partial(profile_memory, top=top)
+
+    @functools.wraps(fn)
+    def profiled(*args, **kwargs):
+        with traced_memory(top) as memory:
+            result = fn(*args, **kwargs)
+        print(show_memory(fn.__qualname__, memory), file=sys.stderr)
+        return result
+    return profiled
+
+
+def show_memory(name, memory):
+    lines = ['%s: %.1f MB peak of traced memory, allocated near the peak by:'
+             % (name, memory['alloc_peak'] / 2 ** 20)]
+    for site in memory['alloc_sites']:
+        lines.append('  %10.1f KB %9d blocks  %s' % (site['size'] / 1024, site['count'],
+                                                     site['site']))
+    return '\n'.join(lines)
+
+
+def measure(job, data=DATA, timeout=None, trace_alloc=False):
+    folder = os.path.join(ROOT, day_of(job.module))
+    fname = os.path.join(data, '%s-input.txt' % day_of(job.module))
+    record = {'name': job_name(job), 'module': job.module,
+              'function': job.function, 'variant': job.variant}
+    with inside(folder), open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        try:
+            day = load_module(job.module)
+            fn = getattr(day, job.function)
+            args = argument_makers(job.module, job.function, fn)[job.variant](day, fname)
+            if timeout:
+                signal.signal(signal.SIGALRM, _timeout)
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            with traced_memory() if trace_alloc else contextlib.nullcontext({}) as memory:
+                wall, cpu = time.perf_counter(), time.process_time()
+                try:
+                    result = fn(*args)
+                finally:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            record.update(memory)
+            record['wall'] = time.perf_counter() - wall
+            record['cpu'] = time.process_time() - cpu
+            record['status'] = 'ok'
+            record['result'] = repr(result)[:200]
+        except Timeout:
+            record['status'] = 'timeout'
+            record['error'] = 'Timeout: more than %ss' % timeout
+        except Exception as e:
+            record['status'] = 'error'
+            record['error'] = '%s: %s' % (type(e).__name__, e)
+    record['max_rss'] = max_rss()
+    return record
+
+
+def load_timings(*fnames):
+    # Wall times of earlier runs by job name, from results or baselines
+    timings = {}
+    for fname in fnames:
+        try:
+            with open(fname, 'r') as file:
+                results = json.load(file)['results']
+        except (OSError, ValueError, KeyError):
+            continue
+        if isinstance(results, dict):
+            results = [dict(metrics, name=name, status='ok') for name, metrics in results.items()]
+        for record in results:
+            if record.get('status') == 'timeout':
+                timings.setdefault(record['name'], float('inf'))
+            elif 'wall' in record:
+                timings.setdefault(record['name'], record['wall'])
+    return timings
+
+
+def schedule(jobs, timings):
+    # Longest first; jobs never timed might be long too, so they go first
+    return sorted(jobs, key=lambda job: -timings.get(job_name(job), float('inf')))
+
+
+def run(jobs, data=DATA, timeout=None, trace_alloc=False, workers=1):
+    # A fresh process for every job keeps ru_maxrss per solver. Jobs start in
+    # the given order and records are yielded as they finish
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, max_tasks_per_child=1) as executor:
+        pending = {executor.submit(measure, job, data, timeout): None for job in jobs}
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                record = pending.pop(future)
+                if record is not None:
+                    # The traced run of a job measured before
+                    traced = future.result()
+                    for key in ('alloc_peak', 'alloc_sites'):
+                        if key in traced:
+                            record[key] = traced[key]
+                    if traced['status'] != 'ok':
+                        record['alloc_error'] = traced['error']
+                    yield record
+                    continue
+                record = future.result()
+                if trace_alloc and record['status'] == 'ok':
+                    # tracemalloc slows everything down, so it gets its own run
+                    job = Job(record['module'], record['function'], record['variant'])
+                    pending[executor.submit(measure, job, data, timeout, True)] = record
+                else:
+                    yield record
+
+
+IMPORT_TIME = re.compile(r'^import time:\s*(\d+) \|\s*(\d+) \| (\s*)(\S+)$')
+
+# Imported by modules only for their tests: test collection has them
+# loaded already, and running a solver doesn't need them
+TEST_IMPORTS = {'pytest'}
+
+
+def import_time(module, runs=3):
+    # Seconds importing the module and what it imports, best of some runs
+    folder = os.path.join(ROOT, day_of(module))
+    name, _ = os.path.splitext(os.path.basename(module))
+    command = [sys.executable, '-X', 'importtime', '-c',
+               '__import__(%r)' % name]
+    best = None
+    for _ in range(runs):
+        process = subprocess.run(command, cwd=folder, capture_output=True, text=True)
+        if process.returncode != 0:
+            raise ImportError(process.stderr.strip().splitlines()[-1])
+        # Lines are 'import time: self [us] | cumulative | name', indented
+        # by how deep the import was, and come before the line of the
+        # module importing them
+        testing = 0
+        for line in process.stderr.splitlines():
+            match = IMPORT_TIME.match(line)
+            if match and match.group(4) in TEST_IMPORTS:
+                testing += int(match.group(2))
+            elif match and not match.group(3) and match.group(4) == name:
+                micros = int(match.group(2)) - testing
+                best = micros if best is None else min(best, micros)
+    return best / 1e6
+
+
+def check_imports(days, budget):
+    # Prints the import time of every module, returning how many went over
+    over = 0
+    for module in modules(days):
+        try:
+            seconds = import_time(module)
+        except ImportError as e:
+            print('%-45s %s' % (module, e))
+            continue
+        exceeded = seconds > budget
+        over += exceeded
+        print('%-45s %9.3fs import%s' % (module, seconds, ' OVER BUDGET' if exceeded else ''),
+              flush=True)
+    return over
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(record):
+    if record['status'] == 'ok':
+        line = '%-45s %9.3fs wall %9.3fs cpu %8.1f MB' % (
+            record['name'], record['wall'], record['cpu'], record['max_rss'] / 2 ** 20)
+        if 'alloc_peak' in record:
+            line += ' %8.1f MB alloc' % (record['alloc_peak'] / 2 ** 20)
+        elif 'alloc_error' in record:
+            line += ' (traced run: %s)' % record['alloc_error']
+        return line
+    return '%-45s %s' % (record['name'], record['error'])
+
+
+METRICS = ('wall', 'cpu', 'alloc_peak')
+
+# Differences below these are noise, whatever the percentage
+SLACK = {'wall': 0.1, 'cpu': 0.1, 'alloc_peak': 2 ** 20}
+
+
+def save_baseline(fname, results):
+    baseline = {record['name']: {metric: record[metric] for metric in METRICS if metric in record}
+                for record in results if record['status'] == 'ok'}
+    with open(fname, 'w') as output:
+        json.dump(dict(environment(), results=baseline), output, indent=2, sort_keys=True)
+
+
+def load_baseline(fname):
+    with open(fname, 'r') as file:
+        return json.load(file)['results']
+
+
+def compare(baseline, results, tolerance):
+    # Solvers of the baseline that didn't run (they failed to import or
+    # were renamed) and metrics that weren't measured fail like regressions:
+    # the new value is None
+    regressions = []
+    measured = {record['name'] for record in results}
+    for name in baseline:
+        if name not in measured:
+            regressions.append((name, 'status', 'ok', None))
+    for record in results:
+        expected = baseline.get(record['name'])
+        if expected is None:
+            continue
+        if record['status'] != 'ok':
+            regressions.append((record['name'], 'status', 'ok', record['status']))
+            continue
+        for metric in METRICS:
+            if metric not in expected:
+                continue
+            if metric not in record:
+                regressions.append((record['name'], metric, expected[metric], None))
+                continue
+            old, new = expected[metric], record[metric]
+            if new > old * (1 + tolerance / 100) and new - old > SLACK[metric]:
+                regressions.append((record['name'], metric, old, new))
+    return regressions
+
+
+def show_value(metric, value):
+    if value is None:
+        return 'missing'
+    if metric == 'alloc_peak':
+        return '%.1f MB' % (value / 2 ** 20)
+    if metric in ('wall', 'cpu'):
+        return '%.3fs' % value
+    return value
+
+
+def show_regressions(regressions, tolerance):
+    lines = ['%d performance regression(s), tolerance %g%%:' % (len(regressions), tolerance)]
+    for name, metric, old, new in regressions:
+        line = '  %-45s %-10s %12s -> %-12s' % (
+            name, metric, show_value(metric, old), show_value(metric, new))
+        if metric != 'status' and new is not None:
+            line += ' (%+.1f%%)' % (100 * (new - old) / old if old else float('inf'))
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def environment():
+    return {'commit': git_commit(),
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the solutions of every day.')
+    parser.add_argument('days', nargs='*', help='days to run (e.g. day3 day9), all by default')
+    parser.add_argument('--data', default=DATA, help='folder with the dayN-input.txt files')
+    parser.add_argument('-o', '--output', default=os.path.join(DATA, 'benchmark.json'),
+                        help='JSON file for the results')
+    parser.add_argument('--timeout', type=float, default=300,
+                        help='seconds before giving up on a solver (0 for no limit)')
+    parser.add_argument('--alloc', action='store_true',
+                        help='also measure the peak of traced allocations and where they come '
+                             'from (an extra run per solver)')
+    parser.add_argument('--save-baseline', metavar='FILE', nargs='?', const=BASELINE,
+                        help='store the results as the new baseline')
+    parser.add_argument('--check', metavar='FILE', nargs='?', const=BASELINE,
+                        help='fail if some solver regressed with respect to the baseline')
+    parser.add_argument('--tolerance', type=float, default=20,
+                        help='allowed slowdown (or extra allocation) in percent')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='solvers to run at once (one per CPU by default, but one when '
+                             'saving or checking a baseline, as parallel timings are noisier)')
+    parser.add_argument('--list', action='store_true', help='only list the discovered entry points')
+    parser.add_argument('--imports', action='store_true',
+                        help='measure the import time of the modules instead of the solvers')
+    parser.add_argument('--import-budget', type=float, default=0.1,
+                        help='seconds a module may take to import, not counting pytest '
+                             '(with --imports)')
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        over = check_imports(args.days, args.import_budget)
+        if over:
+            print('%d module(s) over the import budget of %gs' % (over, args.import_budget),
+                  file=sys.stderr)
+        return 1 if over else 0
+
+    jobs = discover(args.days)
+    if args.list:
+        for job in jobs:
+            print(job_name(job))
+        return 0
+
+    trace_alloc = args.alloc
+    if args.check:
+        baseline = {name: metrics for name, metrics in load_baseline(args.check).items()
+                    if not args.days or day_of(name) in args.days}
+        jobs = [job for job in jobs if job_name(job) in baseline]
+        trace_alloc = trace_alloc or any('alloc_peak' in metrics for metrics in baseline.values())
+
+    workers = args.jobs
+    if workers is None:
+        workers = 1 if args.check or args.save_baseline else os.cpu_count()
+    # Results are reported as they finish but saved in the order of discovery
+    order = {job_name(job): idx for idx, job in enumerate(jobs)}
+    jobs = schedule(jobs, load_timings(args.output, args.check or BASELINE))
+
+    results = []
+    for record in run(jobs, args.data, args.timeout, trace_alloc, workers):
+        print(report(record), flush=True)
+        results.append(record)
+    results.sort(key=lambda record: order[record['name']])
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as output:
+        json.dump(dict(environment(), results=results), output, indent=2)
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+        for record in results:
+            if 'alloc_error' in record:
+                print('%s saved without alloc_peak: %s' % (record['name'], record['alloc_error']),
+                      file=sys.stderr)
+
+    if args.check:
+        regressions = compare(baseline, results, args.tolerance)
+        if regressions:
+            print(show_regressions(regressions, args.tolerance), file=sys.stderr)
+            return 1
+    return 0
+
+
+def test_discover():
+    jobs = discover(['day1', 'day9'])
+    assert Job('day1/day1.py', 'part1', 0) in jobs
+    assert Job('day1/day1.py', 'part1_elems', 0) not in jobs
+    assert Job('day1/day1.py', 'part1_streaming', 0) in jobs
+    assert Job('day9/day9.py', 'calc_part2_mutable', 0) in jobs
+    assert all(job.module not in SKIP for job in jobs)
+
+
+def test_job_name():
+    assert 'day1/day1.py:part2' == job_name(Job('day1/day1.py', 'part2', 0))
+    assert 'day12/day12.py:part1#1' == job_name(Job('day12/day12.py', 'part1', 1))
+
+
+def test_measure(tmp_path):
+    (tmp_path / 'day1-input.txt').write_text('+1\n-2\n+3\n+1\n')
+    record = measure(Job('day1/day1.py', 'part2', 0), str(tmp_path))
+    assert 'ok' == record['status']
+    assert '2' == record['result']
+    assert record['wall'] >= 0 and record['cpu'] >= 0 and record['max_rss'] > 0
+
+
+def test_measure_alloc(tmp_path):
+    (tmp_path / 'day1-input.txt').write_text('+1\n-2\n+3\n+1\n')
+    record = measure(Job('day1/day1.py', 'part1', 0), str(tmp_path), trace_alloc=True)
+    assert record['alloc_peak'] > 0
+    assert 0 < len(record['alloc_sites']) <= ALLOC_SITES
+    assert {'site', 'size', 'count'} == set(record['alloc_sites'][0])
+
+
+def test_profile_memory(capsys):
+    @profile_memory(top=3)
+    def part1():
+        return [[0] * 1000 for _ in range(100)]
+    assert 100 == len(part1())
+    report = capsys.readouterr().err.splitlines()
+    assert '.part1: ' in report[0] and 2 <= len(report) <= 4
+    assert 'benchmark.py:%d' % (part1.__wrapped__.__code__.co_firstlineno + 2) in report[1]
+
+
+def test_traced_memory_temporaries():
+    # The sites of the peak, not of what is left at the end
+    def part1():
+        cells = {cell: cell % 7 for cell in range(90000)}
+        return sum(cells.values())
+    with traced_memory(top=1) as memory:
+        part1()
+    assert memory['alloc_peak'] > 2 ** 20
+    site = memory['alloc_sites'][0]
+    assert 'benchmark.py:%d' % (part1.__code__.co_firstlineno + 1) == site['site']
+    assert site['size'] > memory['alloc_peak'] / 2
+
+
+def test_compare():
+    baseline = {'a': {'cpu': 1.0, 'alloc_peak': 10 * 2 ** 20},
+                'b': {'cpu': 1.0},
+                'c': {'cpu': 0.01}}
+    results = [{'name': 'a', 'status': 'ok', 'cpu': 1.1, 'alloc_peak': 20 * 2 ** 20},
+               {'name': 'b', 'status': 'timeout'},
+               {'name': 'c', 'status': 'ok', 'cpu': 0.05},
+               {'name': 'd', 'status': 'ok', 'cpu': 100.0}]
+    assert [('a', 'alloc_peak', 10 * 2 ** 20, 20 * 2 ** 20),
+            ('b', 'status', 'ok', 'timeout')] == compare(baseline, results, 20)
+
+
+def test_compare_missing():
+    baseline = {'a': {'cpu': 1.0, 'alloc_peak': 10 * 2 ** 20},
+                'gone': {'cpu': 1.0}}
+    results = [{'name': 'a', 'status': 'ok', 'cpu': 1.0, 'alloc_error': 'Timeout'}]
+    regressions = compare(baseline, results, 20)
+    assert [('gone', 'status', 'ok', None), ('a', 'alloc_peak', 10 * 2 ** 20, None)] == regressions
+    assert 'missing' in show_regressions(regressions, 20).splitlines()[2]
+
+
+def test_schedule():
+    jobs = [Job('day1/day1.py', 'part1', 0), Job('day9/day9.py', 'part2', 0),
+            Job('day3/day3.py', 'part1', 0)]
+    timings = {'day1/day1.py:part1': 0.5, 'day9/day9.py:part2': 30.0}
+    assert [jobs[2], jobs[1], jobs[0]] == schedule(jobs, timings)
+
+
+def test_load_timings(tmp_path):
+    results = tmp_path / 'results.json'
+    results.write_text(json.dumps({'results': [
+        {'name': 'a', 'status': 'ok', 'wall': 2.0},
+        {'name': 'b', 'status': 'timeout'},
+        {'name': 'c', 'status': 'error'}]}))
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps({'results': {'a': {'wall': 1.0}, 'd': {'wall': 3.0}}}))
+    assert {'a': 2.0, 'b': float('inf'), 'd': 3.0} == \
+        load_timings(str(results), str(baseline), str(tmp_path / 'missing.json'))
+
+
+def test_run_in_parallel(tmp_path):
+    (tmp_path / 'day1-input.txt').write_text('+1\n-2\n+3\n+1\n')
+    jobs = [Job('day1/day1.py', 'part1', 0), Job('day1/day1.py', 'part2', 0)]
+    records = list(run(jobs, str(tmp_path), trace_alloc=True, workers=2))
+    assert {('day1/day1.py:part1', '3'), ('day1/day1.py:part2', '2')} == \
+        {(record['name'], record['result']) for record in records}
+    assert all('alloc_peak' in record for record in records)
+
+
+def test_import_time(monkeypatch):
+    assert 0 < import_time('day1/day1.py', runs=1) < 1
+    # day15 imports pytest for its fixtures, which isn't counted
+    discounted = import_time('day15/day15.py', runs=1)
+    monkeypatch.setattr(sys.modules[__name__], 'TEST_IMPORTS', set())
+    assert discounted < import_time('day15/day15.py', runs=1)
+
+
+def test_measure_timeout():
+    record = measure(Job('day9/day9.py', 'calc_part2_immutable', 0), timeout=0.1)
+    assert 'timeout' == record['status']
+
+
+def test_measure_missing_input(tmp_path):
+    record = measure(Job('day1/day1.py', 'part1', 0), str(tmp_path))
+    assert 'error' == record['status']
+    assert record['error'].startswith('FileNotFoundError')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,21 +1,149 @@
 # Each folder 'day*' may contain a file named 'input.txt'. What I want is to copy
 # them to the folder 'data', changing its name to 'day*-input.txt'
+#
+# Only the files that changed since the last run are copied: data/manifest.json
+# keeps the hash of every copied file, along with its size and modification
+# time so that unchanged files aren't even read again. Big inputs (the
+# synthetic ones run to hundreds of MB) can be hard linked or reflinked
+# instead of copied:
+#
+#   python copy-inputs.py [--mode copy|hardlink|reflink] [--jobs N]
 
+import argparse
+import fcntl
+import hashlib
+import json
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
-# Get the current working directory
-cwd = os.getcwd()
+MANIFEST = 'manifest.json'
 
-# Get the list of folders
-folders = [folder for folder in os.listdir(cwd) if folder.startswith("day")]
-folders.sort()
+# ioctl asking the file system to share the blocks of another file
+FICLONE = 0x40049409
 
-# Create the folder 'data' if it doesn't exist
-if not os.path.exists("data"):
-    os.mkdir("data")
 
-# Copy the files (if they exist)
-for folder in folders:
-    if os.path.exists(f"{folder}/input.txt"):
-        shutil.copy(f"{folder}/input.txt", f"data/{folder}-input.txt")
+def file_hash(fname):
+    digest = hashlib.sha1()
+    with open(fname, 'rb') as data:
+        for chunk in iter(lambda: data.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def reflink(source, target):
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            # Not supported by the file system (or across file systems)
+            shutil.copyfileobj(src, dst, 1 << 20)
+
+
+def hardlink(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+COPIERS = {'copy': shutil.copyfile, 'hardlink': hardlink, 'reflink': reflink}
+
+
+def load_manifest(data):
+    try:
+        with open(os.path.join(data, MANIFEST), 'r') as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(data, manifest):
+    partial = os.path.join(data, MANIFEST + '.partial')
+    with open(partial, 'w') as out:
+        json.dump(manifest, out, indent=2, sort_keys=True)
+    os.replace(partial, os.path.join(data, MANIFEST))
+
+
+def update(source, target, entry, mode):
+    # The new manifest entry and whether the file was copied
+    stat = os.stat(source)
+    if entry and os.path.exists(target) and \
+            (entry['size'], entry['mtime']) == (stat.st_size, stat.st_mtime_ns):
+        return entry, False
+    digest = file_hash(source)
+    copied = not (entry and entry['sha1'] == digest and os.path.exists(target))
+    if copied:
+        # Written aside and renamed: a hard link must not write through to
+        # the previous version of the input
+        partial = target + '.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+        COPIERS[mode](source, partial)
+        os.replace(partial, target)
+    return {'sha1': digest, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}, copied
+
+
+def copy_inputs(root='.', data='data', mode='copy', jobs=None):
+    """Copies the changed inputs, returning the names of the copied ones."""
+    folders = sorted(folder for folder in os.listdir(root) if folder.startswith("day"))
+    data = os.path.join(root, data)
+    os.makedirs(data, exist_ok=True)
+    manifest = load_manifest(data)
+
+    work = {}
+    for folder in folders:
+        source = os.path.join(root, folder, "input.txt")
+        if os.path.exists(source):
+            work[f"{folder}-input.txt"] = source
+
+    with ThreadPoolExecutor(jobs) as executor:
+        futures = {name: executor.submit(update, source, os.path.join(data, name),
+                                         manifest.get(name), mode)
+                   for name, source in work.items()}
+    copied = []
+    for name, future in futures.items():
+        manifest[name], changed = future.result()
+        if changed:
+            copied.append(name)
+    save_manifest(data, manifest)
+    return copied
+
+
+def test_copy_inputs(tmp_path):
+    for day in ('day1', 'day2'):
+        (tmp_path / day).mkdir()
+        (tmp_path / day / 'input.txt').write_text(day)
+    (tmp_path / 'day3').mkdir()
+    assert ['day1-input.txt', 'day2-input.txt'] == copy_inputs(tmp_path)
+    assert [] == copy_inputs(tmp_path)
+
+    (tmp_path / 'day2' / 'input.txt').write_text('changed')
+    assert ['day2-input.txt'] == copy_inputs(tmp_path)
+    assert 'changed' == (tmp_path / 'data' / 'day2-input.txt').read_text()
+    # Touched but the same contents
+    os.utime(tmp_path / 'day1' / 'input.txt', ns=(0, 0))
+    assert [] == copy_inputs(tmp_path)
+
+    (tmp_path / 'data' / 'day1-input.txt').unlink()
+    assert ['day1-input.txt'] == copy_inputs(tmp_path)
+
+
+def test_copy_modes(tmp_path):
+    (tmp_path / 'day1').mkdir()
+    source = tmp_path / 'day1' / 'input.txt'
+    for mode in ('hardlink', 'reflink', 'copy'):
+        source.write_text(mode)
+        assert ['day1-input.txt'] == copy_inputs(tmp_path, mode=mode)
+        assert mode == (tmp_path / 'data' / 'day1-input.txt').read_text()
+    assert not os.path.samefile(source, tmp_path / 'data' / 'day1-input.txt')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy dayN/input.txt to data/dayN-input.txt")
+    parser.add_argument('--mode', choices=sorted(COPIERS), default='copy',
+                        help="hardlink or reflink to avoid duplicating big inputs")
+    parser.add_argument('--jobs', type=int, default=None, help="threads to use")
+    args = parser.parse_args()
+    for name in copy_inputs(mode=args.mode, jobs=args.jobs):
+        print("Copied", name)
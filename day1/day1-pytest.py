@@ -1,4 +1,7 @@
-from day1 import part1_elems, part2_elems
+import random
+
+import day1
+from day1 import part1_elems, part1_streaming, part2_elems, part2_elems_cycle
 
 # Part 1
 
@@ -14,6 +17,21 @@ def test_part1_example3():
 def test_part1_example4():
     assert -6 == part1_elems([-1, -2, -3])
 
+def test_part1_streaming(tmp_path, monkeypatch):
+    fname = tmp_path / "input.txt"
+    rng = random.Random(2)
+    changes = [rng.randint(-100000, 100000) for _ in range(1000)]
+    fname.write_text("".join("%+d\n" % change for change in changes))
+    for numpy in (day1.numpy, None):
+        monkeypatch.setattr(day1, "numpy", numpy)
+        for chunk_size in (1, 7, 100, 1 << 20):
+            assert sum(changes) == part1_streaming(str(fname), chunk_size)
+
+def test_part1_streaming_without_last_newline(tmp_path):
+    fname = tmp_path / "input.txt"
+    fname.write_text("+1\n-2\n+3")
+    assert 2 == part1_streaming(str(fname), 4)
+
 # Part 2
 
 def test_part2_example1():
@@ -31,5 +49,18 @@ def test_part2_example4():
 def test_part2_example5():
     assert 14 == part2_elems([+7, +7, -2, -7, -4])
 
+def test_part2_never_repeats():
+    assert None == part2_elems([+1, +1])
+    assert None == part2_elems([])
 
+def test_part2_drift():
+    assert 1 == part2_elems([+1, +1, -1])
+    assert -1 == part2_elems([-1, -1, +1])
+    assert 0 == part2_elems([+1000000, -999999, -1])
 
+def test_part2_as_cycle():
+    rng = random.Random(1)
+    for _ in range(300):
+        elems = [rng.randint(-20, 20) for _ in range(rng.randint(1, 12))]
+        if part2_elems(elems) is not None:
+            assert part2_elems_cycle(elems) == part2_elems(elems)
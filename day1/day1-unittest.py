@@ -34,6 +34,9 @@ class TestDay(unittest.TestCase):
     def test_part2_example5(self):
         self.assertEqual(14, part2_elems([+7, +7, -2, -7, -4]))
 
+    def test_part2_never_repeats(self):
+        self.assertIsNone(part2_elems([+1, +1]))
+
 if __name__ == '__main__':
     unittest.main()
 
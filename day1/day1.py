@@ -1,17 +1,80 @@
+import os
+import sys
 from itertools import cycle
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import inputs
+from lazy import lazy_import
+
+try:
+    numpy = lazy_import('numpy')
+except ImportError:
+    numpy = None
+
 def part1(fname):
-    with open(fname, "r") as file:
-        return part1_elems(file.readlines())
+    return part1_elems(inputs.load(fname, inputs.parse_numbers))
 
 def part1_elems(elems):
     return sum(int(elem) for elem in elems)
 
+def part1_streaming(fname, chunk_size=1 << 24):
+    # For logs that don't fit in memory: reads them in chunks, keeping only
+    # the running sum. A line cut by the end of a chunk goes with the next
+    total = 0
+    with open(fname, "rb") as file:
+        rest = b""
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return total + chunk_sum(rest)
+            chunk = rest + chunk
+            end = chunk.rfind(b"\n") + 1
+            total += chunk_sum(chunk[:end])
+            rest = chunk[end:]
+
+def chunk_sum(chunk):
+    # numpy parses the whole chunk at once, without a Python int per line
+    if numpy is None:
+        return sum(map(int, chunk.split()))
+    values = numpy.fromstring(chunk.decode("ascii"), dtype=numpy.int64, sep=" ")
+    return int(values.sum())
+
 def part2(fname):
-    with open(fname, "r") as file:
-        return part2_elems(file.readlines())
+    return part2_elems(inputs.load(fname, inputs.parse_numbers))
 
 def part2_elems(elems):
+    # Frequencies in the first pass, and then the same ones shifted by the
+    # drift of a pass each time: frequency f + k * drift is reached again k
+    # passes after f, so only frequencies with the same remainder modulo the
+    # drift can repeat each other. Returns None if none ever does
+    sums = [0]
+    for elem in elems:
+        sums.append(sums[-1] + int(elem))
+    if len(sums) == 1:
+        return None
+    drift = sums.pop()
+    # Repeats in the first pass (always the case without drift)
+    seen = {0}
+    for sum in sums[1:] + [drift]:
+        if sum in seen:
+            return sum
+        seen.add(sum)
+    groups = {}
+    for idx, sum in enumerate(sums):
+        groups.setdefault(sum % drift, []).append((sum, idx))
+    first = None
+    for group in groups.values():
+        # The next frequency in the direction of the drift is the first one
+        # to be reached
+        group.sort(reverse=drift < 0)
+        for (sum, idx), (repeated, _) in zip(group, group[1:]):
+            time = (repeated - sum) // drift * len(sums) + idx
+            if first is None or time < first[0]:
+                first = time, repeated
+    return first[1] if first else None
+
+def part2_elems_cycle(elems):
     seen = set()
     sum = 0
     for elem in cycle(elems):
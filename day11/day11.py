@@ -1,5 +1,12 @@
 import itertools
-import numpy
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lazy import lazy_import
+
+numpy = lazy_import('numpy')
 
 N = 300
 
@@ -1,114 +1,28 @@
 import collections
 import copy
-import operator
+import os
+import sys
 
-Op = collections.namedtuple('Op', 'opcode a b c')
-Sample = collections.namedtuple('Sample', 'before op after')
-
-
-def make_rr(operator):
-    def opcode(op, input):
-        output = input[:]
-        output[op.c] = operator(
-            input[op.a], input[op.b])
-        return output
-    return opcode
-
-
-def make_ri(operator):
-    def opcode(op, input):
-        output = input[:]
-        output[op.c] = operator(input[op.a], op.b)
-        return output
-    return opcode
-
-
-def make_ir(operator):
-    def opcode(op, input):
-        output = input[:]
-        output[op.c] = operator(op.a, input[op.b])
-        return output
-    return opcode
-
-
-addr = make_rr(operator.add)
-addi = make_ri(operator.add)
-
-mulr = make_rr(operator.mul)
-muli = make_ri(operator.mul)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-banr = make_rr(operator.and_)
-bani = make_ri(operator.and_)
+import elfcode
 
-borr = make_rr(operator.or_,)
-bori = make_ri(operator.or_,)
-
-
-def setr(op, input):
-    output = input[:]
-    output[op.c] = input[op.a]
-    return output
-
-
-def seti(op, input):
-    output = input[:]
-    output[op.c] = op.a
-    return output
-
-
-gtir = make_ir(lambda arg1, arg2: 1 if arg1 > arg2 else 0)
-gtri = make_ri(lambda arg1, arg2: 1 if arg1 > arg2 else 0)
-gtrr = make_rr(lambda arg1, arg2: 1 if arg1 > arg2 else 0)
-
-eqir = make_ir(lambda arg1, arg2: 1 if arg1 == arg2 else 0)
-eqri = make_ri(lambda arg1, arg2: 1 if arg1 == arg2 else 0)
-eqrr = make_rr(lambda arg1, arg2: 1 if arg1 == arg2 else 0)
-
-OPS = {addr, addi, mulr, muli, banr, bani, borr, bori,
-       setr, seti, gtir, gtri, gtrr, eqir, eqri, eqrr}
+Op = collections.namedtuple('Op', 'opcode a b c')
+Sample = collections.namedtuple('Sample', 'before op after')
 
 
 def compatible_ops(sample):
-    return {op_fn for op_fn in OPS if op_fn(sample.op, sample.before) == sample.after}
-
-
-def test_ops():
-    assert [0, 10, 20, 10 + 20] == addr(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 10 + 2] == addi(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 10 * 20] == mulr(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 10 * 2] == muli(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 10 & 20] == banr(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 10 & 2] == bani(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 10 | 20] == borr(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 10 | 2] == bori(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 10] == setr(Op(
-        opcode=None, a=1, b=None, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 1] == seti(Op(
-        opcode=None, a=1, b=None, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 0] == gtir(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 1] == gtri(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 0] == gtrr(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 0] == eqir(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 0] == eqri(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
-    assert [0, 10, 20, 0] == eqrr(Op(
-        opcode=None, a=1, b=2, c=3), [0, 10, 20, 40])
+    compatible = set()
+    for opname, op_fn in elfcode.OPS.items():
+        registers = sample.before[:]
+        op_fn(registers, sample.op.a, sample.op.b, sample.op.c)
+        if registers == sample.after:
+            compatible.add(opname)
+    return compatible
 
 
 def test_compatible_ops():
-    assert {mulr, addi, seti} == compatible_ops(
+    assert {'mulr', 'addi', 'seti'} == compatible_ops(
         Sample(before=[3, 2, 1, 1], op=Op(9, 2, 1, 2), after=[3, 2, 2, 1]))
 
 
@@ -142,7 +56,7 @@ class Parser():
 
 
 def part1(fname):
-    samples, _ = Parser('../data/day16-input.txt').parse()
+    samples, _ = Parser(fname).parse()
     return sum(1 for sample in samples if len(compatible_ops(sample)) >= 3)
 
 
@@ -169,15 +83,15 @@ def propagate(table):
 
 
 def run(program, assignments):
-    register = [0] * 4
-    for op in program:
-        op_fn = assignments[op.opcode]
-        register = op_fn(op, register)
-    return register
+    decoded = elfcode.Program(elfcode.Instruction(assignments[op.opcode], op.a, op.b, op.c)
+                              for op in program)
+    machine = elfcode.Machine(decoded, size=4)
+    machine.run()
+    return machine.registers
 
 
 def part2(fname):
-    samples, program = Parser('../data/day16-input.txt').parse()
+    samples, program = Parser(fname).parse()
     ct = compatibility_table(samples)
     assignments, remaining = propagate(ct)
     assert len(remaining) == 0
@@ -1,41 +1,13 @@
 import os
+import sys
 
-OPS = {'addi': 'r[{c}] = r[{a}] + {b}',
-       'addr': 'r[{c}] = r[{a}] + r[{b}]',
-       'muli': 'r[{c}] = r[{a}] * {b}',
-       'mulr': 'r[{c}] = r[{a}] * r[{b}]',
-       'seti': 'r[{c}] = {a}',
-       'setr': 'r[{c}] = r[{a}]',
-       'eqrr': 'r[{c}] = 1 if r[{a}] == r[{b}] else 0',
-       'gtrr': 'r[{c}] = 1 if r[{a}] > r[{b}] else 0'
-       }
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from elfcode import disassemble, parse
 
 
 def compile_line(line, lineno, ipreg):
-    opname = line[:4]
-    a, b, c = map(int, line[4:].split())
-    if opname == 'addi' and c == ipreg and a == ipreg:
-        return 'jump #%d' % (b+lineno+1,)
-    elif opname == 'addr' and c == ipreg and a == ipreg:
-        return 'jump r[%d] + %d' % (b, lineno+1)
-    elif opname == 'addr' and c == ipreg and b == ipreg:
-        return 'jump r[%d] + %d' % (a, lineno+1)
-    elif opname == 'seti' and c == ipreg:
-        return 'jump #%d' % (a+1,)
-    elif opname == 'mulr' and a == ipreg and b == ipreg and c == ipreg:
-        return 'jump #%d' %(lineno * lineno + 1,)
-    elif opname == 'addr' and b == ipreg:
-        return 'r[%d] = r[%d] + %d' %(c, a, lineno)
-    elif opname == 'addr' and a == ipreg:
-        return 'r[%d] = r[%d] + %d' % (c, b, lineno)
-    elif opname == 'mulr' and b == ipreg:
-        return 'r[%d] = r[%d] * %d' %(c, a, lineno)
-    elif opname == 'mulr' and a == ipreg:
-        return 'r[%d] = r[%d] * %d' % (c, b, lineno)
-    elif opname == 'setr' and a == ipreg:
-        return 'r[%d] = %d' % (c, lineno)
-    else:
-        return OPS[opname].format(a=a, b=b, c=c)
+    return disassemble(parse(line), lineno, ipreg)
 
 
 def compile_lines(lines, ipreg):
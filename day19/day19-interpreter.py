@@ -1,145 +1,41 @@
-import collections
-import operator
+import os
+import sys
 
-# Operations copied from day16
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-Op = collections.namedtuple('Op', 'opname a b c')
-
-
-def make_rr(operator_):
-    def opcode(op, input_):
-        output = input_[:]
-        output[op.c] = operator_(
-            input_[op.a], input_[op.b])
-        return output
-
-    return opcode
-
-
-def make_ri(operator_):
-    def opcode(op, input_):
-        output = input_[:]
-        output[op.c] = operator_(input_[op.a], op.b)
-        return output
-
-    return opcode
-
-
-def make_ir(operator_):
-    def opcode(op, input_):
-        output = input_[:]
-        output[op.c] = operator_(op.a, input_[op.b])
-        return output
-
-    return opcode
-
-
-addr = make_rr(operator.add)
-addi = make_ri(operator.add)
-
-mulr = make_rr(operator.mul)
-muli = make_ri(operator.mul)
-
-banr = make_rr(operator.and_)
-bani = make_ri(operator.and_)
-
-borr = make_rr(operator.or_, )
-bori = make_ri(operator.or_, )
-
-
-def setr(op, input_):
-    output = input_[:]
-    output[op.c] = input_[op.a]
-    return output
-
-
-def seti(op, input_):
-    output = input_[:]
-    output[op.c] = op.a
-    return output
-
-
-gtir = make_ir(lambda arg1, arg2: 1 if arg1 > arg2 else 0)
-gtri = make_ri(lambda arg1, arg2: 1 if arg1 > arg2 else 0)
-gtrr = make_rr(lambda arg1, arg2: 1 if arg1 > arg2 else 0)
-
-eqir = make_ir(lambda arg1, arg2: 1 if arg1 == arg2 else 0)
-eqri = make_ri(lambda arg1, arg2: 1 if arg1 == arg2 else 0)
-eqrr = make_rr(lambda arg1, arg2: 1 if arg1 == arg2 else 0)
-
-OPS = {'addr': addr, 'addi': addi,
-       'mulr': mulr, 'muli': muli,
-       'banr': banr, 'bani': bani,
-       'borr': borr, 'bori': bori,
-       'setr': setr, 'seti': seti,
-       'gtir': gtir, 'gtri': gtri, 'gtrr': gtrr,
-       'eqir': eqir, 'eqri': eqri, 'eqrr': eqrr}
-
-
-class Machine:
-
-    def __init__(self):
-        self.register = [0] * 6
-        self.ipreg = 0
-        self.program = []
-
-    def load(self, fname):
-        with open(fname, 'r') as program:
-            line = program.readline()
-            self.ipreg = int(line[4:])
-            self.program = [parse(line) for line in program]
-
-    def run(self, register=None, do_trace=None):
-        if register:
-            self.register = register
-
-        trace = []
-
-        while True:
-            ip = self.register[self.ipreg]
-
-            if ip >= len(self.program):
-                break
-
-            before = self.register[:]
-            instr = self.program[ip]
-
-            self.register = OPS[instr.opname](instr, self.register)
-
-            if do_trace:
-                trace.append('ip=%d %s %s %d %d %d %s' %
-                             (ip, before, instr.opname, instr.a, instr.b, instr.c, self.register))
-
-            self.register[self.ipreg] += 1
-        return trace
-
-
-def show(instr):
-    return "%s %d %d %d" % (instr.opname, instr.a, instr.b, instr.c)
-
-
-def parse(line):
-    opname = line[:4]
-    a, b, c = map(int, line[4:].split())
-    return Op(opname, a, b, c)
+from elfcode import Instruction, Machine, parse
 
 
 def part1(fname):
     machine = Machine()
     machine.load(fname)
     machine.run()
-    return machine.register[0]
+    return machine.registers[0]
+
+
+def profile(fname, registers=None):
+    # Which lines the program spends its time on, to spot the loops worth
+    # rewriting by hand (or as an elfcode idiom)
+    machine = Machine()
+    machine.load(fname)
+    machine.run(registers, profile=True)
+    return machine.hotspots()
 
 
 def part2(fname):
     machine = Machine()
     machine.load(fname)
     machine.run([1, 0, 0, 0, 0, 0])
-    return machine.register[0]
+    return machine.registers[0]
 
 
 def test_parse():
-    assert Op(opname='seti', a=5, b=0, c=1) == parse('seti 5 0 1')
+    assert Instruction(opname='seti', a=5, b=0, c=1) == parse('seti 5 0 1')
+
+
+def test_part2():
+    # See day19-explanation.md
+    assert 17427456 == part2('../data/day19-input.txt')
 
 
 def test_run():
@@ -156,5 +52,7 @@ def test_run():
 
 
 if __name__ == '__main__':
+    if '--profile' in sys.argv:
+        profile('../data/day19-input.txt')
     print("Part1:", part1('../data/day19-input.txt'))
-    # print("Part2:", part2('../data/day19-input.txt'))
+    print("Part2:", part2('../data/day19-input.txt'))
@@ -1,5 +1,18 @@
+import os
+import random
+import sys
+import time
 from collections import Counter
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lazy import lazy_import
+
+try:
+    numpy = lazy_import("numpy")
+except ImportError:
+    numpy = None
+
 # Part 1
 
 def part1(fname):
@@ -20,6 +33,46 @@ def test_checksum():
     boxes = ["abcdef", "bababc", "abbcde", "abcccd", "aabcdd", "abcdee", "ababab"]
     assert 12 == checksum(boxes)
 
+def part1_numpy(fname):
+    with open(fname, "r") as boxes:
+        return checksum_numpy([box.strip() for box in boxes])
+
+def checksum_numpy(boxes, chunk=1 << 10):
+    # The boxes (all of the same length, lowercase) as rows of a uint8
+    # matrix. Offsetting the codes of every row by 26 * row makes a single
+    # bincount give the histogram of every row, and or-ing 1 << count over
+    # a row says which counts appear. Small chunks of rows stay in cache
+    lengths = {len(box) for box in boxes}
+    if len(lengths) > 1:
+        raise ValueError("box ids must all have the same length")
+    if not boxes or not lengths.pop():
+        return 0
+    letters = numpy.frombuffer("".join(boxes).encode("ascii"), dtype=numpy.uint8)
+    if letters.min() < ord("a") or letters.max() > ord("z"):
+        raise ValueError("box ids must be lowercase letters")
+    rows = letters.reshape(len(boxes), -1)
+    offsets = (26 * numpy.arange(chunk, dtype=numpy.int32) - ord("a"))[:, None]
+    count2 = count3 = 0
+    for start in range(0, len(rows), chunk):
+        block = rows[start:start+chunk]
+        codes = block + offsets[:len(block)]
+        histograms = numpy.bincount(codes.ravel(), minlength=26 * len(block)).reshape(-1, 26)
+        counts = numpy.bitwise_or.reduce(numpy.left_shift(1, histograms), axis=1)
+        count2 += int(numpy.count_nonzero(counts & (1 << 2)))
+        count3 += int(numpy.count_nonzero(counts & (1 << 3)))
+    return count2 * count3
+
+def test_checksum_numpy():
+    import pytest
+    pytest.importorskip("numpy")
+    boxes = ["abcdef", "bababc", "abbcde", "abcccd", "aabcdd", "abcdee", "ababab"]
+    assert 12 == checksum_numpy(boxes)
+    assert 12 == checksum_numpy(boxes, chunk=3)
+    assert 0 == checksum_numpy([])
+    assert checksum(["", ""]) == checksum_numpy(["", ""])
+    with pytest.raises(ValueError):
+        checksum_numpy(["aaa", "bb", "c"])
+
 def check_word(word):
     counter = Counter(word)
     values = counter.values()
@@ -58,7 +111,47 @@ def common_letters(word1, word2):
 def test_common_letters():
     assert "fgij" == common_letters("fghij", "fguij")
 
-def correct_boxes(boxes):
+def near_duplicates(boxes):
+    # Pairs of indices (i < j) of the boxes differing in exactly one char.
+    # Those boxes are equal once that char is masked out, and they share
+    # either the first or the second half, so only boxes sharing a half
+    # need masking: O(n * L) hashing
+    pairs = []
+    for first_half in (True, False):
+        # Most halves are unique: only the repeated ones get a group
+        first, groups = {}, {}
+        for idx, box in enumerate(boxes):
+            middle = len(box) // 2
+            half = (len(box), box[:middle] if first_half else box[middle:])
+            seen = first.setdefault(half, idx)
+            if seen != idx:
+                groups.setdefault(half, [seen]).append(idx)
+        for (length, _), group in groups.items():
+            middle = length // 2
+            for pos in range(middle, length) if first_half else range(middle):
+                masked = {}
+                for idx in group:
+                    box = boxes[idx]
+                    masked.setdefault(box[:pos] + box[pos+1:], []).append(idx)
+                for same in masked.values():
+                    pairs.extend((idx1, idx2) for nth, idx1 in enumerate(same)
+                                 for idx2 in same[nth+1:] if boxes[idx1] != boxes[idx2])
+    return sorted(pairs)
+
+def test_near_duplicates():
+    boxes = ["abcde", "fghij", "klmno", "pqrst", "fguij", "axcye", "wvxyz", "fguij", "fgui"]
+    assert [(1, 4), (1, 7)] == near_duplicates(boxes)
+    assert [] == near_duplicates([])
+
+def correct_boxes(boxes, all_pairs=False):
+    pairs = near_duplicates(boxes)
+    if all_pairs:
+        return [(boxes[idx1], boxes[idx2]) for idx1, idx2 in pairs]
+    if pairs:
+        idx1, idx2 = pairs[0]
+        return boxes[idx1], boxes[idx2] # we assume occurs only once
+
+def correct_boxes_pairwise(boxes):
     for idx, box1 in enumerate(boxes):
         for box2 in boxes[idx+1:]:
             differing = differing_chars(box1, box2)
@@ -68,12 +161,94 @@ def correct_boxes(boxes):
 def test_correct_boxes():
     boxes = ["abcde", "fghij", "klmno", "pqrst", "fguij", "axcye", "wvxyz"]
     assert ("fghij", "fguij") == correct_boxes(boxes)
+    assert ("fghij", "fguij") == correct_boxes_pairwise(boxes)
+    assert [("abcde", "abcdz"), ("fghij", "fguij")] == correct_boxes(boxes + ["abcdz"], all_pairs=True)
+
+# Queries for the boxes near to any other one
+
+def hamming(box1, box2, limit):
+    # Distance between boxes of the same length, or limit + 1 once over limit
+    distance = 0
+    for c1, c2 in zip(box1, box2):
+        if c1 != c2:
+            distance += 1
+            if distance > limit:
+                break
+    return distance
+
+class HammingIndex:
+    # Multi-index hashing: ids are cut in max_distance + 1 segments and two
+    # ids within max_distance of each other agree on one of them at least,
+    # so only the ids sharing a segment with the query are compared
+
+    def __init__(self, boxes, max_distance=2):
+        self.boxes = [box.strip() for box in boxes]
+        self.max_distance = max_distance
+        self.segments = {}
+        for idx, box in enumerate(self.boxes):
+            for nth, segment in enumerate(self.cut(box)):
+                self.segments.setdefault((len(box), nth, segment), []).append(idx)
+
+    def cut(self, box):
+        pieces = self.max_distance + 1
+        bounds = [len(box) * piece // pieces for piece in range(pieces + 1)]
+        return [box[start:end] for start, end in zip(bounds, bounds[1:])]
+
+    def within(self, box, distance):
+        """(distance, box) of the boxes at most distance chars away, nearest first."""
+        if distance > self.max_distance:
+            raise ValueError("the index only answers up to distance %d" % self.max_distance)
+        candidates = set()
+        for nth, segment in enumerate(self.cut(box)):
+            candidates.update(self.segments.get((len(box), nth, segment), ()))
+        found = []
+        for idx in candidates:
+            other = self.boxes[idx]
+            d = hamming(box, other, distance)
+            if d <= distance:
+                found.append((d, other))
+        return sorted(found)
+
+def within_brute(boxes, box, distance):
+    distances = [(hamming(box, other, distance), other) for other in boxes if len(other) == len(box)]
+    return sorted((d, other) for d, other in distances if d <= distance)
+
+def test_hamming_index():
+    boxes = ["abcde", "fghij", "klmno", "pqrst", "fguij", "axcye", "wvxyz", "abcd"]
+    index = HammingIndex(boxes)
+    assert [(0, "fghij"), (1, "fguij")] == index.within("fghij", 1)
+    assert [(1, "abcde"), (1, "axcye")] == index.within("axcde", 2)
+    assert [(0, "abcd")] == index.within("abcd", 2)
+    for box in ["abcde", "fgxij", "zzzzz", "axcye", "pqrsz"]:
+        for distance in range(3):
+            assert within_brute(boxes, box, distance) == index.within(box, distance)
+
+def benchmark_index(boxes, queries, distance):
+    # Seconds building the index and answering the queries, and seconds
+    # answering them scanning all the boxes
+    start = time.perf_counter()
+    index = HammingIndex(boxes, distance)
+    built = time.perf_counter()
+    answers = [index.within(query, distance) for query in queries]
+    indexed = time.perf_counter()
+    assert answers == [within_brute(index.boxes, query, distance) for query in queries]
+    return built - start, indexed - built, time.perf_counter() - indexed
 
 def part2(fname):
     with open(fname, "r") as boxes:
         correct = correct_boxes(boxes.readlines())
         return common_letters(*correct)
 
-if __name__ == "__main__":
+if __name__ == "__main__" and "--bench-index" in sys.argv:
+    # python day2.py --bench-index: the index against a scan of all the boxes
+    import generate
+    boxes = list(generate.generate("day2", 100000))
+    rng = random.Random(0)
+    queries = [box[:5] + rng.choice("abc") + box[6:] for box in rng.sample(boxes, 50)]
+    for distance in (1, 2, 3):
+        build, indexed, brute = benchmark_index(boxes, queries, distance)
+        print("distance %d: index built in %.2fs, %d queries in %.3fs, %.2fs scanning (x%.0f)"
+              % (distance, build, len(queries), indexed, brute, brute / indexed))
+elif __name__ == "__main__":
     print(part1("../data/day2-input.txt"))
     print(part2("../data/day2-input.txt"))
@@ -1,4 +1,10 @@
+import os
 import string
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import elfcode
 
 TEMPLATE = string.Template("""
 #include <stdio.h>
@@ -81,25 +87,22 @@ $cases
 """)
 
 
-def compile_line(line):
-    opname = line[:4]
-    a, b, c = line[4:].split()
-    return '%s(%s, %s, %s);' % (opname, a, b, c)
+def compile_instruction(instr):
+    return '%s(%d, %d, %d);' % instr
 
 
-def compile_lines(lines):
+def compile_program(program):
     cases = []
-    for lineno, line in enumerate(lines):
-        cases.append('      case %d: %s break;' % (lineno, compile_line(line)))
+    for lineno, instr in enumerate(program):
+        cases.append('      case %d: %s break;' % (lineno, compile_instruction(instr)))
     return '\n'.join(cases)
 
 
 def compile_file(fname, registers):
-    with open(fname, 'r') as program:
-        registers = str(registers).replace('[', '{').replace(']', '}')
-        ipreg = program.readline().strip()[4:]
-        cases = compile_lines(line.strip() for line in program)
-        return TEMPLATE.substitute(ipreg=ipreg, cases=cases, registers=registers)
+    program = elfcode.load(fname)
+    registers = str(registers).replace('[', '{').replace(']', '}')
+    cases = compile_program(program)
+    return TEMPLATE.substitute(ipreg=program.ipreg, cases=cases, registers=registers)
 
 
 def part1(fname):
@@ -0,0 +1,67 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from elfcode import Machine
+
+
+def halting_check(program):
+    # The only instruction that reads r[0] compares it with the value that
+    # would make the program halt
+    for ip, instr in enumerate(program):
+        if instr.opname == 'eqrr' and 0 in (instr.a, instr.b):
+            return ip, instr.b if instr.a == 0 else instr.a
+
+
+def halting_values(fname):
+    # The program keeps generating candidates for r[0] in a 24-bit register
+    # and halts on the first one that matches, so part1 is the first value
+    # and part2 the last before they repeat. Seen values are kept in a 2 MB
+    # bitset over the 24-bit values instead of a set that grows with them
+    machine = Machine()
+    machine.load(fname)
+    check, register = halting_check(machine.program)
+    seen = bytearray(1 << 21)
+    # The first and the last value seen
+    values = [None, None]
+
+    def candidate(registers):
+        value = registers[register] & 0xffffff
+        byte, bit = value >> 3, 1 << (value & 7)
+        if seen[byte] & bit:
+            return True
+        seen[byte] |= bit
+        if values[0] is None:
+            values[0] = value
+        values[1] = value
+        return False
+    machine.run(watch={check: candidate})
+    return tuple(values)
+
+
+def part1(fname):
+    machine = Machine()
+    machine.load(fname)
+    check, register = halting_check(machine.program)
+    while machine.ip != check:
+        machine.step()
+    return machine.registers[register]
+
+
+def part2(fname):
+    return halting_values(fname)[1]
+
+
+def test_part1():
+    assert 12935354 == part1('../data/day21-input.txt')
+
+
+def test_halting_values():
+    assert (12935354, 12390302) == halting_values('../data/day21-input.txt')
+
+
+if __name__ == '__main__':
+    first, last = halting_values('../data/day21-input.txt')
+    print("Part1:", first)
+    print("Part2:", last)
@@ -1,8 +1,14 @@
 import collections
 import operator
+import os
 import re
+import sys
 
-import z3
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lazy import lazy_import
+
+z3 = lazy_import('z3')
 
 line_regexp = re.compile(r'^pos=<(?P<x>-?\d+),(?P<y>-?\d+),(?P<z>-?\d+)>, r=(?P<r>\d+)$')
 
@@ -1,5 +1,12 @@
-import numpy as np
-import scipy.cluster.hierarchy as hc
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+hc = lazy_import('scipy.cluster.hierarchy')
 
 
 def parse_file(fname):
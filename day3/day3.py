@@ -1,9 +1,30 @@
+import os
+import random
+import sys
+from heapq import heappop, heappush
 from re import compile
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import inputs
+from lazy import lazy_import
+
+try:
+    numpy = lazy_import("numpy")
+except ImportError:
+    numpy = None
+
+regexp = compile(r"^#(?P<id>\d+) @ (?P<x>\d+),(?P<y>\d+): (?P<w>\d+)x(?P<h>\d+)$")
+
 def parse(line):
-    regexp = compile(r"^#(?P<id>\d+) @ (?P<x>\d+),(?P<y>\d+): (?P<w>\d+)x(?P<h>\d+)$")
     return tuple(int(g) for g in regexp.match(line).groups())
 
+def parse_claims(lines):
+    return [parse(line) for line in lines]
+
+def claims(fname):
+    return inputs.load(fname, parse_claims, width=5)
+
 def test_parse():
     assert (1, 286, 440, 19, 24) == parse("#1 @ 286,440: 19x24")
 
@@ -52,8 +73,145 @@ def test_total_overlap():
     assert 4 == total_overlap(claims)
 
 def part1(fname):
-    with open(fname, "r") as file:
-        return total_overlap(parse(line) for line in file)
+    return total_overlap(claims(fname))
+
+def claims_array(claims):
+    # Claims as an n x 5 int64 matrix, without copying the cached ones
+    if isinstance(claims, inputs.Table):
+        return numpy.asarray(claims.values).reshape(-1, 5)
+    return numpy.array(list(claims), dtype=numpy.int64).reshape(-1, 5)
+
+def total_overlap_numpy(claims, strip_cells=1 << 24):
+    # Each claim adds 1 at its top left and bottom right corners and -1 at
+    # the other two of a difference array, and cumulative sums along both
+    # axes give the number of claims over every square inch. The fabric is
+    # swept in strips of rows, carrying the column sums from one to the next,
+    # so that only strip_cells counters are alive at a time
+    data = claims_array(claims)
+    if not len(data):
+        return 0
+    _, x, y, w, h = data.T
+    width = int((x + w).max()) + 1
+    rows = numpy.concatenate((y, y, y + h, y + h))
+    cols = numpy.concatenate((x, x + w, x, x + w))
+    one = numpy.ones(len(x), dtype=numpy.int32)
+    signs = numpy.concatenate((one, -one, -one, one))
+    order = numpy.argsort(rows, kind="stable")
+    rows, cols, signs = rows[order], cols[order], signs[order]
+    height = int(rows[-1]) + 1
+    strip = max(1, strip_cells // width)
+    carry = numpy.zeros(width, dtype=numpy.int32)
+    more_than_one = 0
+    for top in range(0, height, strip):
+        bottom = min(top + strip, height)
+        start, end = numpy.searchsorted(rows, (top, bottom))
+        cells = (rows[start:end] - top) * width + cols[start:end]
+        block = numpy.zeros((bottom - top, width), dtype=numpy.int32)
+        numpy.add.at(block.reshape(-1), cells, signs[start:end])
+        block[0] += carry
+        numpy.cumsum(block, axis=0, out=block)
+        carry = block[-1].copy()
+        numpy.cumsum(block, axis=1, out=block)
+        more_than_one += int(numpy.count_nonzero(block > 1))
+    return more_than_one
+
+def test_total_overlap_numpy():
+    import pytest
+    pytest.importorskip("numpy")
+    claims = [(1,1,3,4,4), (2,3,1,4,4), (3,5,5,2,2)]
+    assert 4 == total_overlap_numpy(claims)
+    assert 4 == total_overlap_numpy(claims, strip_cells=1)
+    assert 0 == total_overlap_numpy([])
+    rng = random.Random(1)
+    claims = [(idx, rng.randrange(50), rng.randrange(50), rng.randint(1, 10), rng.randint(1, 10))
+              for idx in range(200)]
+    assert total_overlap(claims) == total_overlap_numpy(claims, strip_cells=100)
+
+def part1_numpy(fname):
+    return total_overlap_numpy(claims(fname))
+
+class CoverTree:
+    # Segment tree over the compressed rows, the intervals between
+    # consecutive distinct edges ys[i]..ys[i+1]. Every node knows how many
+    # claims cover all of its interval and how long its parts covered by
+    # one claim at least and by two at least are
+
+    def __init__(self, ys):
+        self.ys = ys
+        size = 4 * max(1, len(ys))
+        self.count = [0] * size
+        self.once = [0] * size
+        self.twice = [0] * size
+
+    def add(self, top, bottom, delta, node=1, lo=0, hi=None):
+        # Adds delta to the rows ys[top]..ys[bottom]
+        if hi is None:
+            hi = len(self.ys) - 1
+        if bottom <= lo or hi <= top:
+            return
+        if top <= lo and hi <= bottom:
+            self.count[node] += delta
+        else:
+            middle = (lo + hi) // 2
+            self.add(top, bottom, delta, 2 * node, lo, middle)
+            self.add(top, bottom, delta, 2 * node + 1, middle, hi)
+        self.update(node, lo, hi)
+
+    def update(self, node, lo, hi):
+        count = self.count[node]
+        leaf = hi - lo == 1
+        if count >= 2:
+            self.once[node] = self.twice[node] = self.ys[hi] - self.ys[lo]
+        elif count == 1:
+            self.once[node] = self.ys[hi] - self.ys[lo]
+            self.twice[node] = 0 if leaf else self.once[2 * node] + self.once[2 * node + 1]
+        elif leaf:
+            self.once[node] = self.twice[node] = 0
+        else:
+            self.once[node] = self.once[2 * node] + self.once[2 * node + 1]
+            self.twice[node] = self.twice[2 * node] + self.twice[2 * node + 1]
+
+    def covered_twice(self):
+        return self.twice[1]
+
+def total_overlap_compressed(claims):
+    # Area claimed twice at least without a cell per square inch: columns
+    # are swept from edge to edge of the claims, and the tree gives the
+    # length of the rows covered twice between one edge and the next, so
+    # it only depends on the number of claims, not on their coordinates
+    events = []
+    ys = set()
+    for _, x, y, w, h in claims:
+        if w and h:
+            events.append((x, 1, y, y + h))
+            events.append((x + w, -1, y, y + h))
+            ys.update((y, y + h))
+    ys = sorted(ys)
+    row = {y: idx for idx, y in enumerate(ys)}
+    tree = CoverTree(ys)
+    events.sort()
+    area = 0
+    last = events[0][0] if events else 0
+    for x, delta, top, bottom in events:
+        area += tree.covered_twice() * (x - last)
+        tree.add(row[top], row[bottom], delta)
+        last = x
+    return area
+
+def test_total_overlap_compressed():
+    claims = [(1,1,3,4,4), (2,3,1,4,4), (3,5,5,2,2)]
+    assert 4 == total_overlap_compressed(claims)
+    assert 0 == total_overlap_compressed([])
+    huge = [(id, x * 10**9, y * 10**9, w * 10**9, h * 10**9) for id, x, y, w, h in claims]
+    assert 4 * 10**18 == total_overlap_compressed(huge)
+    rng = random.Random(3)
+    for _ in range(20):
+        claims = [(idx, rng.randrange(30), rng.randrange(30), rng.randint(0, 8), rng.randint(0, 8))
+                  for idx in range(30)]
+        assert total_overlap(claims) == total_overlap_compressed(claims)
+
+def part1_compressed(fname):
+    return total_overlap_compressed(claims(fname))
 
 def not_overlaps(claims):
     for claim1 in claims:
@@ -70,9 +228,144 @@ def test_not_overlaps():
     claims = [(1,1,3,4,4), (2,3,1,4,4), (3,5,5,2,2)]
     assert 3 == not_overlaps(claims)
 
+def isolated_claims(claims):
+    # Ids of the claims overlapping no other, in order. Claims are swept
+    # from left to right keeping the ones whose columns are still under
+    # the sweep line (a heap pops them by right edge), in bands of rows as
+    # tall as an average claim, so each claim is only compared with the
+    # ones sharing some column and some band with it
+    claims = list(claims)
+    band = max(1, sum(claim[4] for claim in claims) // max(1, len(claims)))
+    overlapping = set()
+    ends = []
+    active = {}
+    for idx in sorted(range(len(claims)), key=lambda idx: claims[idx][1]):
+        _, x, y, w, h = claims[idx]
+        while ends and ends[0][0] <= x:
+            _, old = heappop(ends)
+            _, _, top, _, height = claims[old]
+            for row in range(top // band, (top + height - 1) // band + 1):
+                del active[row][old]
+        if w == 0 or h == 0:
+            continue
+        rows = range(y // band, (y + h - 1) // band + 1)
+        for row in rows:
+            for other, (top, bottom) in active.setdefault(row, {}).items():
+                if top < y + h and y < bottom:
+                    overlapping.add(other)
+                    overlapping.add(idx)
+        heappush(ends, (x + w, idx))
+        for row in rows:
+            active[row][idx] = (y, y + h)
+    return [claim[0] for idx, claim in enumerate(claims) if idx not in overlapping]
+
+def test_isolated_claims():
+    claims = [(1,1,3,4,4), (2,3,1,4,4), (3,5,5,2,2)]
+    assert [3] == isolated_claims(claims)
+    assert [1, 2] == isolated_claims([(1,0,0,2,2), (2,2,0,2,2)])
+    rng = random.Random(2)
+    for _ in range(20):
+        claims = [(idx, rng.randrange(30), rng.randrange(30), rng.randint(0, 6), rng.randint(0, 6))
+                  for idx in range(1, 40)]
+        assert [claim[0] for claim in claims
+                if not any(overlaps(claim, other) for other in claims if other != claim)] \
+            == isolated_claims(claims)
+
 def part2(fname):
-    with open(fname, "r") as file:
-        return not_overlaps([parse(line) for line in file])
+    return next(iter(isolated_claims(claims(fname))), None)
+
+def test_part2_without_isolated_claims(tmp_path):
+    fname = tmp_path / "input.txt"
+    fname.write_text("#1 @ 1,3: 4x4\n#2 @ 3,1: 4x4\n")
+    assert None == part2(str(fname))
+    fname.write_text("#1 @ 1,3: 4x4\n#2 @ 3,1: 4x4\n#3 @ 5,5: 2x2\n")
+    assert 3 == part2(str(fname))
+
+class ClaimIndex:
+    # Claims coming and going: every square inch knows its claim (or the
+    # set of its claims when there are several), every claim how many of
+    # its square inches are shared. Adding or removing a claim costs its
+    # area, whatever the number of claims
+    #
+    #   index = ClaimIndex(parse(line) for line in lines)
+    #   index.remove_claim(3); index.overlap_area; index.is_isolated(7)
+
+    def __init__(self, claims=()):
+        self.claims = {}
+        self.cells = {}
+        self.shared = {}
+        self.overlap_area = 0
+        for claim in claims:
+            self.add_claim(claim)
+
+    def squares(self, claim):
+        _, x, y, w, h = claim
+        return ((xx, yy) for xx in range(x, x + w) for yy in range(y, y + h))
+
+    def add_claim(self, claim):
+        id = claim[0]
+        if id in self.claims:
+            raise KeyError("claim #%d is already there" % id)
+        self.claims[id] = claim
+        self.shared[id] = 0
+        for square in self.squares(claim):
+            owners = self.cells.get(square)
+            if owners is None:
+                self.cells[square] = id
+            elif isinstance(owners, set):
+                owners.add(id)
+                self.shared[id] += 1
+            else:
+                self.cells[square] = {owners, id}
+                self.shared[owners] += 1
+                self.shared[id] += 1
+                self.overlap_area += 1
+
+    def remove_claim(self, id):
+        claim = self.claims.pop(id)
+        del self.shared[id]
+        for square in self.squares(claim):
+            owners = self.cells[square]
+            if not isinstance(owners, set):
+                del self.cells[square]
+                continue
+            owners.discard(id)
+            if len(owners) == 1:
+                last = owners.pop()
+                self.cells[square] = last
+                self.shared[last] -= 1
+                self.overlap_area -= 1
+
+    def is_isolated(self, id):
+        return self.shared[id] == 0
+
+def test_claim_index():
+    index = ClaimIndex([(1,1,3,4,4), (2,3,1,4,4), (3,5,5,2,2)])
+    assert 4 == index.overlap_area
+    assert [False, False, True] == [index.is_isolated(id) for id in (1, 2, 3)]
+    index.add_claim((4,6,6,3,3))
+    assert 5 == index.overlap_area and not index.is_isolated(3)
+    index.remove_claim(2)
+    assert 1 == index.overlap_area and index.is_isolated(1)
+    index.remove_claim(4)
+    assert 0 == index.overlap_area and index.is_isolated(3)
+
+def test_claim_index_as_recomputing():
+    rng = random.Random(4)
+    index = ClaimIndex()
+    alive = {}
+    for step in range(300):
+        if alive and rng.random() < 0.4:
+            id = rng.choice(sorted(alive))
+            index.remove_claim(id)
+            del alive[id]
+        else:
+            claim = (step, rng.randrange(20), rng.randrange(20), rng.randint(1, 6), rng.randint(1, 6))
+            index.add_claim(claim)
+            alive[step] = claim
+        claims = list(alive.values())
+        assert total_overlap(claims) == index.overlap_area
+        assert sorted(isolated_claims(claims)) == sorted(id for id in alive if index.is_isolated(id))
 
 if __name__ == "__main__":
     print("Part1: ", part1("../data/day3-input.txt"))
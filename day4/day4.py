@@ -1,69 +1,89 @@
+import datetime
+import os
+import sys
+import tempfile
+from bisect import bisect_left, bisect_right
+from heapq import merge
 from re import compile
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import inputs
+from lazy import lazy_import
+
+try:
+    numpy = lazy_import("numpy")
+except ImportError:
+    numpy = None
+
 lineRegexp = compile(r"^\[\d+-\d+-\d+ \d+:(\d+)\] (.+)$")
 guardRegexp = compile(r"^Guard #(\d+) ")
 
-def most_minutes_guard(data):
-    total_minutes = {}
-    for line in data:
+BEGINS, FALLS, WAKES = range(3)
+
+def parse_events(lines):
+    # (minute, guard, kind) in chronological order, with the guard on duty
+    # for every event
+    return list(iter_events(sorted(lines)))
+
+def iter_events(lines):
+    # Events of lines already in chronological order
+    for line in lines:
         minute, text = lineRegexp.match(line).groups()
-        minute = int(minute)
         matchGuard = guardRegexp.match(text)
         if matchGuard:
             lastGuard = int(matchGuard.group(1))
-            total_minutes.setdefault(lastGuard, 0)
+            yield int(minute), lastGuard, BEGINS
         elif text.startswith("falls"):
-            beginSleep = minute
+            yield int(minute), lastGuard, FALLS
         elif text.startswith("wakes"):
-            endSleep = minute
-            total_minutes[lastGuard] += endSleep - beginSleep
+            yield int(minute), lastGuard, WAKES
+
+def events(fname):
+    return inputs.load(fname, parse_events, width=3)
+
+def most_minutes_guard(events):
+    total_minutes = {}
+    for minute, guard, kind in events:
+        if kind == BEGINS:
+            total_minutes.setdefault(guard, 0)
+        elif kind == FALLS:
+            beginSleep = minute
+        elif kind == WAKES:
+            total_minutes[guard] += minute - beginSleep
     return max(total_minutes, key=lambda k: total_minutes[k])
 
-def best_minute(guard, data):
+def best_minute(guard, events):
     minutes = {}
-    for line in data:
-        minute, text = lineRegexp.match(line).groups()
-        minute = int(minute)
-        matchGuard = guardRegexp.match(text)
-        if matchGuard:
-            lastGuard = int(matchGuard.group(1))
-        elif guard == lastGuard and text.startswith("falls"):
+    for minute, lastGuard, kind in events:
+        if guard == lastGuard and kind == FALLS:
             beginSleep = minute
-        elif guard == lastGuard and text.startswith("wakes"):
-            endSleep = minute
-            for min in range(beginSleep, endSleep):
+        elif guard == lastGuard and kind == WAKES:
+            for min in range(beginSleep, minute):
                 minutes.setdefault(min, 0)
                 minutes[min] += 1
     return max(minutes, key=lambda k: minutes[k])
 
-def guard_mult_minutes(data):
-    data.sort()
-    guard = most_minutes_guard(data)
-    minute = best_minute(guard, data)
+def guard_mult_minutes(events):
+    guard = most_minutes_guard(events)
+    minute = best_minute(guard, events)
     return guard * minute
 
 def part1(fname):
-    with open(fname, "r") as file:
-        return guard_mult_minutes(file.readlines())
+    return guard_mult_minutes(events(fname))
 
 
-def guard_and_minute_most_frequently_sleep(data):
-    data.sort()
+def guard_and_minute_most_frequently_sleep(events):
     counters = {}
-    for line in data:
-        minute, text = lineRegexp.match(line).groups()
-        minute = int(minute)
-        matchGuard = guardRegexp.match(text)
-        if matchGuard:
-            lastGuard = int(matchGuard.group(1))
-            counters.setdefault(lastGuard, {})
-        elif text.startswith("falls"):
+    for minute, guard, kind in events:
+        if kind == BEGINS:
+            counters.setdefault(guard, {})
+        elif kind == FALLS:
             beginSleep = minute
-        elif text.startswith("wakes"):
-            endSleep = minute
-            for minute in range(beginSleep, endSleep):
-                counters[lastGuard].setdefault(minute, 0)
-                counters[lastGuard][minute] += 1
+        elif kind == WAKES:
+            for min in range(beginSleep, minute):
+                counters[guard].setdefault(min, 0)
+                counters[guard][min] += 1
     return maxcoordinates(counters)
 
 def maxcoordinates(counters):
@@ -77,9 +97,152 @@ def maxcoordinates(counters):
     return max_guard, max_minute
 
 def part2(fname):
-    with open(fname, "r") as file:
-        guard, minute =  guard_and_minute_most_frequently_sleep(file.readlines())
-        return guard * minute
+    guard, minute =  guard_and_minute_most_frequently_sleep(events(fname))
+    return guard * minute
+
+def sleep_ledger(events):
+    # Guard ids and a guards x 60 matrix of how many times each one slept
+    # each minute, from +1 when falling asleep and -1 when waking up at the
+    # rows of a difference array summed along the minutes
+    if isinstance(events, inputs.Table):
+        events = numpy.asarray(events.values).reshape(-1, 3)
+    else:
+        events = numpy.array(list(events), dtype=numpy.int64).reshape(-1, 3)
+    minutes, guards, kinds = events.T
+    ids, rows = numpy.unique(guards, return_inverse=True)
+    ledger = numpy.zeros((len(ids), 61), dtype=numpy.int32)
+    falls, wakes = kinds == FALLS, kinds == WAKES
+    numpy.add.at(ledger, (rows[falls], minutes[falls]), 1)
+    numpy.add.at(ledger, (rows[wakes], minutes[wakes]), -1)
+    return ids, numpy.cumsum(ledger[:, :60], axis=1, dtype=numpy.int32)
+
+def strategies(events):
+    # Guard times minute of both strategies: the guard sleeping the most
+    # and its most slept minute, and the guard and minute slept most often
+    ids, ledger = sleep_ledger(events)
+    sleepiest = int(ledger.sum(axis=1).argmax())
+    strategy1 = int(ids[sleepiest]) * int(ledger[sleepiest].argmax())
+    guard, minute = numpy.unravel_index(ledger.argmax(), ledger.shape)
+    return strategy1, int(ids[guard]) * int(minute)
+
+def part1_numpy(fname):
+    return strategies(events(fname))[0]
+
+def part2_numpy(fname):
+    return strategies(events(fname))[1]
+
+def external_sort(fname, chunk_lines=1 << 20):
+    # The lines of the file in order, for files that don't fit in memory:
+    # sorted runs of chunk_lines lines are written to temporary files and
+    # merged lazily, so only a chunk and a line per run are in memory
+    with open(fname, "r") as file, tempfile.TemporaryDirectory() as folder:
+        runs = []
+        while True:
+            chunk = [line.rstrip("\n") for _, line in zip(range(chunk_lines), file)]
+            if not chunk:
+                break
+            chunk.sort()
+            runs.append(open(os.path.join(folder, "run%d" % len(runs)), "w+"))
+            runs[-1].writelines(line + "\n" for line in chunk)
+            runs[-1].seek(0)
+        try:
+            for line in merge(*runs):
+                yield line.rstrip("\n")
+        finally:
+            for run in runs:
+                run.close()
+
+def stream_ledger(events):
+    # Like sleep_ledger without numpy, with memory for the guards only
+    ledger = {}
+    for minute, guard, kind in events:
+        counts = ledger.setdefault(guard, [0] * 61)
+        if kind == FALLS:
+            counts[minute] += 1
+        elif kind == WAKES:
+            counts[minute] -= 1
+    for guard, counts in ledger.items():
+        for minute in range(1, 61):
+            counts[minute] += counts[minute - 1]
+        del counts[60]
+    return ledger
+
+def part1_external(fname, chunk_lines=1 << 20):
+    ledger = stream_ledger(iter_events(external_sort(fname, chunk_lines)))
+    guard = max(ledger, key=lambda guard: sum(ledger[guard]))
+    return guard * max(range(60), key=lambda minute: ledger[guard][minute])
+
+def part2_external(fname, chunk_lines=1 << 20):
+    ledger = stream_ledger(iter_events(external_sort(fname, chunk_lines)))
+    guard, minute = max(((guard, minute) for guard in ledger for minute in range(60)),
+                        key=lambda gm: ledger[gm[0]][gm[1]])
+    return guard * minute
+
+def date_ordinal(date):
+    # Days of the proleptic Gregorian calendar, from "YYYY-MM-DD" or a date
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    return date.toordinal()
+
+def timestamp(line):
+    # Minutes since the start of the calendar of the log line
+    return (date_ordinal(line[1:11]) * 24 + int(line[12:14])) * 60 + int(lineRegexp.match(line).group(1))
+
+class SleepIndex:
+    # When the guards slept, for arbitrary questions about it: intervals
+    # [start, end) of integer timestamps, sorted, for all the guards
+    # (only one is on duty at a time) and for every guard, with the prefix
+    # sums of their lengths
+    #
+    #   index = SleepIndex(lines)
+    #   index.asleep("1518-11-01", 7)            # guard asleep then, or None
+    #   index.total_sleep(10, "1518-11-01", "1518-11-03")
+
+    def __init__(self, lines):
+        self.starts, self.ends, self.guards = [], [], []
+        self.intervals = {}
+        for stamp, text in sorted((timestamp(line), lineRegexp.match(line).group(2))
+                                  for line in lines):
+            matchGuard = guardRegexp.match(text)
+            if matchGuard:
+                guard = int(matchGuard.group(1))
+                self.intervals.setdefault(guard, ([], [], [0]))
+            elif text.startswith("falls"):
+                beginSleep = stamp
+            elif text.startswith("wakes"):
+                self.starts.append(beginSleep)
+                self.ends.append(stamp)
+                self.guards.append(guard)
+                starts, ends, sums = self.intervals[guard]
+                starts.append(beginSleep)
+                ends.append(stamp)
+                sums.append(sums[-1] + stamp - beginSleep)
+
+    def asleep(self, date, minute, hour=0):
+        """The guard asleep at that minute of the date, None if all are awake."""
+        stamp = (date_ordinal(date) * 24 + hour) * 60 + minute
+        idx = bisect_right(self.starts, stamp) - 1
+        if idx >= 0 and stamp < self.ends[idx]:
+            return self.guards[idx]
+        return None
+
+    def total_sleep(self, guard, first, last):
+        """Minutes the guard slept from the date first to the date last, both included."""
+        if guard not in self.intervals:
+            return 0
+        starts, ends, sums = self.intervals[guard]
+        start, end = date_ordinal(first) * 24 * 60, (date_ordinal(last) + 1) * 24 * 60
+        lo = bisect_right(ends, start)
+        hi = bisect_left(starts, end)
+        if lo >= hi:
+            return 0
+        # Whole intervals, trimming the first and last to the range
+        total = sums[hi] - sums[lo]
+        total -= max(0, start - starts[lo]) + max(0, ends[hi - 1] - end)
+        return total
+
+    def sleep_by_guard(self, first, last):
+        return {guard: self.total_sleep(guard, first, last) for guard in self.intervals}
 
 test_data = [
     "[1518-11-01 00:00] Guard #10 begins shift", 
@@ -101,20 +264,48 @@ test_data = [
     "[1518-11-05 00:55] wakes up", 
 ]
 
+def test_parse_events():
+    assert (5, 10, FALLS) == parse_events(test_data)[1]
+    assert (45, 99, FALLS) == parse_events(reversed(test_data))[-2]
+
 def test_most_minutes_guard():
-    assert 10 == most_minutes_guard(test_data)
+    assert 10 == most_minutes_guard(parse_events(test_data))
 
 def test_best_minute():
-    assert 24 == best_minute(10,test_data)
+    assert 24 == best_minute(10,parse_events(test_data))
 
 def test_guard_mult_minutes():
-    assert 240 ==guard_mult_minutes(test_data)
+    assert 240 ==guard_mult_minutes(parse_events(test_data))
 
 def test_part1():
     assert 30630 == part1("../data/day4-input.txt")
 
 def test_guard_most_frequenly_sleep_same_minute():
-    assert (99, 45) == guard_and_minute_most_frequently_sleep(test_data)
+    assert (99, 45) == guard_and_minute_most_frequently_sleep(parse_events(test_data))
+
+def test_strategies():
+    import pytest
+    pytest.importorskip("numpy")
+    assert (240, 4455) == strategies(parse_events(test_data))
+
+def test_external_sort(tmp_path):
+    fname = tmp_path / "input.txt"
+    fname.write_text("\n".join(reversed(test_data)))
+    assert test_data == list(external_sort(str(fname), chunk_lines=4))
+    assert 240 == part1_external(str(fname), chunk_lines=3)
+    assert 4455 == part2_external(str(fname), chunk_lines=3)
+
+def test_sleep_index():
+    index = SleepIndex(reversed(test_data))
+    assert 10 == index.asleep("1518-11-01", 5)
+    assert None == index.asleep("1518-11-01", 25)
+    assert 99 == index.asleep(datetime.date(1518, 11, 5), 54)
+    assert None == index.asleep("1518-11-01", 58, hour=23)
+    assert 50 == index.total_sleep(10, "1518-11-01", "1518-11-03")
+    assert 45 == index.total_sleep(10, "1518-11-01", "1518-11-01")
+    assert 20 == index.total_sleep(99, "1518-11-04", "1518-11-30")
+    assert 0 == index.total_sleep(99, "1518-11-06", "1518-11-30")
+    assert {10: 5, 99: 20} == index.sleep_by_guard("1518-11-03", "1518-11-05")
 
 def test_part2():
     assert 136571 == part2("../data/day4-input.txt")
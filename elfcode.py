@@ -0,0 +1,880 @@
+# Virtual machine for the ElfCode of days 16, 19 and 21.
+#
+# A program is decoded once into arrays (one for the opcode numbers and one
+# for each operand) and the instructions mutate the registers in place.
+#
+#   program = load('input.txt')          # '#ip N' binds the ip to register N
+#   machine = Machine(program, [1, 0, 0, 0, 0, 0])
+#   machine.ip = 17                      # jump somewhere
+#   machine.step()                       # one instruction, False if halted
+#   machine.run()                        # until the ip leaves the program
+#   machine.registers[0]
+
+import array
+import collections
+import hashlib
+import math
+import random
+import sys
+
+Instruction = collections.namedtuple('Instruction', 'opname a b c')
+
+
+def addr(r, a, b, c):
+    r[c] = r[a] + r[b]
+
+
+def addi(r, a, b, c):
+    r[c] = r[a] + b
+
+
+def mulr(r, a, b, c):
+    r[c] = r[a] * r[b]
+
+
+def muli(r, a, b, c):
+    r[c] = r[a] * b
+
+
+def banr(r, a, b, c):
+    r[c] = r[a] & r[b]
+
+
+def bani(r, a, b, c):
+    r[c] = r[a] & b
+
+
+def borr(r, a, b, c):
+    r[c] = r[a] | r[b]
+
+
+def bori(r, a, b, c):
+    r[c] = r[a] | b
+
+
+def setr(r, a, b, c):
+    r[c] = r[a]
+
+
+def seti(r, a, b, c):
+    r[c] = a
+
+
+def gtir(r, a, b, c):
+    r[c] = 1 if a > r[b] else 0
+
+
+def gtri(r, a, b, c):
+    r[c] = 1 if r[a] > b else 0
+
+
+def gtrr(r, a, b, c):
+    r[c] = 1 if r[a] > r[b] else 0
+
+
+def eqir(r, a, b, c):
+    r[c] = 1 if a == r[b] else 0
+
+
+def eqri(r, a, b, c):
+    r[c] = 1 if r[a] == b else 0
+
+
+def eqrr(r, a, b, c):
+    r[c] = 1 if r[a] == r[b] else 0
+
+
+OPNAMES = ('addr', 'addi', 'mulr', 'muli', 'banr', 'bani', 'borr', 'bori',
+           'setr', 'seti', 'gtir', 'gtri', 'gtrr', 'eqir', 'eqri', 'eqrr')
+
+OPS = {'addr': addr, 'addi': addi,
+       'mulr': mulr, 'muli': muli,
+       'banr': banr, 'bani': bani,
+       'borr': borr, 'bori': bori,
+       'setr': setr, 'seti': seti,
+       'gtir': gtir, 'gtri': gtri, 'gtrr': gtrr,
+       'eqir': eqir, 'eqri': eqri, 'eqrr': eqrr}
+
+OPCODES = {opname: opcode for opcode, opname in enumerate(OPNAMES)}
+
+
+class Program:
+
+    def __init__(self, instructions, ipreg=None):
+        self.ipreg = ipreg
+        self.opcodes = array.array('B')
+        self.a = array.array('q')
+        self.b = array.array('q')
+        self.c = array.array('q')
+        for instr in instructions:
+            self.opcodes.append(OPCODES[instr.opname])
+            self.a.append(instr.a)
+            self.b.append(instr.b)
+            self.c.append(instr.c)
+        # What the interpreter loop actually walks through
+        self.decoded = [(OPS[OPNAMES[op]], a, b, c)
+                        for op, a, b, c in zip(self.opcodes, self.a, self.b, self.c)]
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __getitem__(self, ip):
+        return Instruction(OPNAMES[self.opcodes[ip]], self.a[ip], self.b[ip], self.c[ip])
+
+    def __iter__(self):
+        return (self[ip] for ip in range(len(self)))
+
+    def key(self):
+        digest = hashlib.sha1(repr(self.ipreg).encode())
+        for column in (self.opcodes, self.a, self.b, self.c):
+            digest.update(column.tobytes())
+        return digest.hexdigest()
+
+
+def parse(line):
+    opname = line[:4]
+    a, b, c = map(int, line[4:].split())
+    return Instruction(opname, a, b, c)
+
+
+def parse_program(lines):
+    lines = [line.strip() for line in lines if line.strip()]
+    ipreg = None
+    if lines and lines[0].startswith('#ip'):
+        ipreg = int(lines[0][4:])
+        lines = lines[1:]
+    return Program((parse(line) for line in lines), ipreg)
+
+
+def load(fname):
+    with open(fname, 'r') as file:
+        return parse_program(file)
+
+
+def show(instr):
+    return "%s %d %d %d" % (instr.opname, instr.a, instr.b, instr.c)
+
+
+DISASSEMBLY = {'addr': 'r[{c}] = r[{a}] + r[{b}]', 'addi': 'r[{c}] = r[{a}] + {b}',
+               'mulr': 'r[{c}] = r[{a}] * r[{b}]', 'muli': 'r[{c}] = r[{a}] * {b}',
+               'banr': 'r[{c}] = r[{a}] & r[{b}]', 'bani': 'r[{c}] = r[{a}] & {b}',
+               'borr': 'r[{c}] = r[{a}] | r[{b}]', 'bori': 'r[{c}] = r[{a}] | {b}',
+               'setr': 'r[{c}] = r[{a}]', 'seti': 'r[{c}] = {a}',
+               'gtir': 'r[{c}] = 1 if {a} > r[{b}] else 0',
+               'gtri': 'r[{c}] = 1 if r[{a}] > {b} else 0',
+               'gtrr': 'r[{c}] = 1 if r[{a}] > r[{b}] else 0',
+               'eqir': 'r[{c}] = 1 if {a} == r[{b}] else 0',
+               'eqri': 'r[{c}] = 1 if r[{a}] == {b} else 0',
+               'eqrr': 'r[{c}] = 1 if r[{a}] == r[{b}] else 0'}
+
+
+def disassemble(instr, lineno, ipreg):
+    opname, a, b, c = instr
+    if opname == 'addi' and c == ipreg and a == ipreg:
+        return 'jump #%d' % (b+lineno+1,)
+    elif opname == 'addr' and c == ipreg and a == ipreg:
+        return 'jump r[%d] + %d' % (b, lineno+1)
+    elif opname == 'addr' and c == ipreg and b == ipreg:
+        return 'jump r[%d] + %d' % (a, lineno+1)
+    elif opname == 'seti' and c == ipreg:
+        return 'jump #%d' % (a+1,)
+    elif opname == 'mulr' and a == ipreg and b == ipreg and c == ipreg:
+        return 'jump #%d' %(lineno * lineno + 1,)
+    elif opname == 'addr' and b == ipreg:
+        return 'r[%d] = r[%d] + %d' %(c, a, lineno)
+    elif opname == 'addr' and a == ipreg:
+        return 'r[%d] = r[%d] + %d' % (c, b, lineno)
+    elif opname == 'mulr' and b == ipreg:
+        return 'r[%d] = r[%d] * %d' %(c, a, lineno)
+    elif opname == 'mulr' and a == ipreg:
+        return 'r[%d] = r[%d] * %d' % (c, b, lineno)
+    elif opname == 'setr' and a == ipreg:
+        return 'r[%d] = %d' % (c, lineno)
+    else:
+        return DISASSEMBLY[opname].format(a=a, b=b, c=c)
+
+
+# Compiler from ElfCode to Python functions
+#
+# The program is split into basic blocks, which start at jump targets (and
+# right after jumps) and end when an instruction writes the ip. Each block
+# becomes straight-line Python over the locals r0, r1, ... where reading the
+# ip is just the constant line number. A jump to a line that doesn't start a
+# block (`addr 0 2 2` jumps to r[0] + 26, say) leaves the compiled function
+# and the interpreter steps until it reaches a block again.
+
+EXPRESSIONS = {'addr': '{A} + {B}', 'addi': '{A} + {b}',
+               'mulr': '{A} * {B}', 'muli': '{A} * {b}',
+               'banr': '{A} & {B}', 'bani': '{A} & {b}',
+               'borr': '{A} | {B}', 'bori': '{A} | {b}',
+               'setr': '{A}', 'seti': '{a}',
+               'gtir': '1 if {a} > {B} else 0',
+               'gtri': '1 if {A} > {b} else 0',
+               'gtrr': '1 if {A} > {B} else 0',
+               'eqir': '1 if {a} == {B} else 0',
+               'eqri': '1 if {A} == {b} else 0',
+               'eqrr': '1 if {A} == {B} else 0'}
+
+READS_A = {'addr', 'addi', 'mulr', 'muli', 'banr', 'bani', 'borr', 'bori',
+           'setr', 'gtri', 'gtrr', 'eqri', 'eqrr'}
+READS_B = {'addr', 'mulr', 'banr', 'borr', 'gtir', 'gtrr', 'eqir', 'eqrr'}
+COMPARISONS = {'gtir', 'gtri', 'gtrr', 'eqir', 'eqri', 'eqrr'}
+
+
+def reads(instr):
+    registers = set()
+    if instr.opname in READS_A:
+        registers.add(instr.a)
+    if instr.opname in READS_B:
+        registers.add(instr.b)
+    return registers
+
+
+def expression(instr, lineno, ipreg):
+    def register(reg):
+        return str(lineno) if reg == ipreg else 'r%d' % reg
+    return EXPRESSIONS[instr.opname].format(a=instr.a, b=instr.b,
+                                            A=register(instr.a), B=register(instr.b))
+
+
+def jump_targets(program, lineno, leaders):
+    # Where the jump at lineno can go, None if it depends on the data
+    instr = program[lineno]
+    source = expression(instr, lineno, program.ipreg)
+    unknown = reads(instr) - {program.ipreg}
+    if not unknown:
+        return {eval(source) + 1}
+    if instr.opname in COMPARISONS:
+        return {1, 2}
+    if len(unknown) == 1:
+        # A register just set by a comparison is 0 or 1
+        register = unknown.pop()
+        for previous in range(lineno - 1, -1, -1):
+            if previous + 1 in leaders or program.c[previous] == program.ipreg:
+                return None
+            if program.c[previous] == register:
+                if program[previous].opname not in COMPARISONS:
+                    return None
+                return {eval(source, {}, {'r%d' % register: value}) + 1 for value in (0, 1)}
+    return None
+
+
+def find_leaders(program, extra=()):
+    jumps = [lineno for lineno in range(len(program)) if program.c[lineno] == program.ipreg]
+    leaders = {0} | {lineno + 1 for lineno in jumps if lineno + 1 < len(program)}
+    leaders |= {lineno for lineno in extra if 0 <= lineno < len(program)}
+    while True:
+        targets = set()
+        for lineno in jumps:
+            targets |= jump_targets(program, lineno, leaders) or set()
+        extended = leaders | {target for target in targets if 0 <= target < len(program)}
+        if extended == leaders:
+            return sorted(leaders)
+        leaders = extended
+
+
+# Loop idioms
+#
+# Some loops of the puzzle inputs compute simple things the slow way: day19
+# sums the divisors of a number with two nested loops and day21 divides by
+# 256 counting up. They are found by matching the instructions against
+# patterns in the notation of the disassembler (lowercase letters stand for
+# registers, uppercase ones for constants and jumps are relative to the
+# first instruction) and each loop is replaced with a superinstruction that
+# computes its register effects directly.
+
+SYMBOLS = {'addr': '+', 'addi': '+', 'mulr': '*', 'muli': '*',
+           'banr': '&', 'bani': '&', 'borr': '|', 'bori': '|',
+           'setr': '=', 'seti': '=',
+           'gtir': '>', 'gtri': '>', 'gtrr': '>',
+           'eqir': '==', 'eqri': '==', 'eqrr': '=='}
+
+COMMUTATIVE = {'+', '*', '&', '|', '=='}
+
+Idiom = collections.namedtuple('Idiom', 'name pattern valid effect samples')
+
+
+def sum_of_divisors(n):
+    total = 0
+    for d in range(1, math.isqrt(n) + 1):
+        if n % d == 0:
+            total += d if d * d == n else d + n // d
+    return total
+
+
+def divisor_sum_effect(r, v):
+    n = r[v['n']]
+    if n >= 1:
+        r[v['s']] += sum_of_divisors(n)
+    r[v['i']] = r[v['j']] = max(n, 1) + 1
+    r[v['t']] = 1
+
+
+def divide_effect(r, v):
+    n = r[v['n']]
+    r[v['q']] = n // v['K'] if n >= 0 else 0
+    r[v['t']] = 1
+
+
+IDIOMS = [
+    # for i in 1..n: for j in 1..n: if i * j == n: s += i
+    Idiom('divisor sum',
+          ['i = 1', 'j = 1', 't = i * j', 't = t == n', 'skip t', 'jump 7',
+           's = i + s', 'j = j + 1', 't = j > n', 'skip t', 'jump 2',
+           'i = i + 1', 't = i > n', 'skip t', 'jump 1'],
+          lambda v: True, divisor_sum_effect, [-3, 0, 1, 2, 6, 12, 28, 30]),
+    # q = 0; while (q + 1) * K <= n: q += 1
+    Idiom('division',
+          ['q = 0', 't = q + 1', 't = t * K', 't = t > n', 'skip t', 'jump 7',
+           'jump 9', 'q = q + 1', 'jump 1'],
+          lambda v: v['K'] > 0, divide_effect, [-5, 0, 1, 255, 256, 257, 1000, 4096]),
+]
+
+
+def normalize(program, lineno):
+    instr = program[lineno]
+    ipreg = program.ipreg
+
+    def operand(value, is_register):
+        if not is_register:
+            return 'k', value
+        return ('k', lineno) if value == ipreg else ('r', value)
+
+    if instr.c == ipreg:
+        if not reads(instr) - {ipreg}:
+            return 'jump', eval(expression(instr, lineno, ipreg)) + 1
+        if instr.opname == 'addr' and ipreg in (instr.a, instr.b):
+            return 'skip', instr.b if instr.a == ipreg else instr.a
+        return 'ip',
+    a = operand(instr.a, instr.opname in READS_A)
+    if instr.opname in ('setr', 'seti'):
+        return '=', instr.c, a
+    return SYMBOLS[instr.opname], instr.c, a, operand(instr.b, instr.opname in READS_B)
+
+
+def parse_step(step):
+    tokens = step.split()
+    if tokens[0] in ('jump', 'skip'):
+        return tuple(tokens)
+    if len(tokens) == 3:
+        return '=', tokens[0], tokens[2]
+    return tokens[3], tokens[0], tokens[2], tokens[4]
+
+
+def unify(token, operand, bindings):
+    kind, value = operand
+    if token.islower():
+        if kind != 'r':
+            return None
+        if token in bindings:
+            return bindings if bindings[token] == value else None
+        if value in (bound for name, bound in bindings.items() if name.islower()):
+            return None
+        return dict(bindings, **{token: value})
+    if kind != 'k':
+        return None
+    if token.isupper():
+        if token in bindings:
+            return bindings if bindings[token] == value else None
+        return dict(bindings, **{token: value})
+    return bindings if int(token) == value else None
+
+
+def match(idiom, program, start, bindings=None, step=0):
+    if bindings is None:
+        bindings = {}
+        if start + len(idiom.pattern) > len(program):
+            return None
+    if step == len(idiom.pattern):
+        return bindings if idiom.valid(bindings) else None
+    expected = parse_step(idiom.pattern[step])
+    actual = normalize(program, start + step)
+    if expected[0] != actual[0]:
+        return None
+    if expected[0] == 'jump':
+        if actual[1] != start + int(expected[1]):
+            return None
+        return match(idiom, program, start, bindings, step + 1)
+    if expected[0] == 'skip':
+        bindings = unify(expected[1], ('r', actual[1]), bindings)
+        return bindings and match(idiom, program, start, bindings, step + 1)
+    orders = [actual[2:]]
+    if expected[0] in COMMUTATIVE:
+        orders.append(actual[:1:-1])
+    for operands in orders:
+        attempt = unify(expected[1], ('r', actual[1]), bindings)
+        for token, operand in zip(expected[2:], operands):
+            attempt = attempt and unify(token, operand, attempt)
+        attempt = attempt and match(idiom, program, start, attempt, step + 1)
+        if attempt:
+            return attempt
+    return None
+
+
+def superinstruction(program, idiom, bindings, start):
+    ipreg = program.ipreg
+    exit = start + len(idiom.pattern)
+
+    def op_fn(r, a, b, c):
+        idiom.effect(r, bindings)
+        r[ipreg] = exit - 1
+    return op_fn
+
+
+def registers_used(program):
+    used = {program.ipreg}
+    for instr in program:
+        used |= reads(instr) | {instr.c}
+    return max(used) + 1
+
+
+def verify(program, idiom, bindings, start, budget=10 ** 6):
+    # The superinstruction must leave the registers as the loop itself
+    op_fn = superinstruction(program, idiom, bindings, start)
+    exit = start + len(idiom.pattern)
+    rand = random.Random(start)
+    for n in idiom.samples:
+        registers = [rand.randrange(50) for _ in range(registers_used(program))]
+        registers[bindings['n']] = n
+        registers[program.ipreg] = start
+        machine = Machine(program, registers)
+        for _ in range(budget):
+            if not start <= machine.ip < exit:
+                break
+            machine.step()
+        expected = registers[:]
+        op_fn(expected, 0, 0, 0)
+        expected[program.ipreg] += 1
+        if machine.registers != expected:
+            return False
+    return True
+
+
+_idioms = {}
+
+
+def find_idioms(program):
+    """Superinstructions for the loops of the program, by first line."""
+    key = program.key()
+    if key not in _idioms:
+        found = {}
+        if program.ipreg is not None:
+            for start in range(len(program)):
+                for idiom in IDIOMS:
+                    bindings = match(idiom, program, start)
+                    if bindings and verify(program, idiom, bindings, start):
+                        found[start] = superinstruction(program, idiom, bindings, start), \
+                                       start + len(idiom.pattern)
+                        break
+        _idioms[key] = found
+    return _idioms[key]
+
+
+_optimized = {}
+
+
+def optimized(program):
+    """The decoded program with its loops replaced by superinstructions."""
+    key = program.key()
+    if key not in _optimized:
+        decoded = program.decoded[:]
+        for start, (op_fn, _) in find_idioms(program).items():
+            decoded[start] = (op_fn, 0, 0, 0)
+        _optimized[key] = decoded
+    return _optimized[key]
+
+
+def compile_block(program, start, leaders, lines, indent):
+    lineno = start
+    while True:
+        instr = program[lineno]
+        source = expression(instr, lineno, program.ipreg)
+        if instr.c == program.ipreg:
+            lines.append('%sip = (%s) + 1' % (indent, source))
+            return
+        lines.append('%sr%d = %s' % (indent, instr.c, source))
+        lineno += 1
+        if lineno in leaders or lineno == len(program):
+            lines.append('%sip = %d' % (indent, lineno))
+            return
+
+
+def compile_idiom(program, start, registers, lines, indent):
+    # Superinstructions work on the list of registers
+    lines.append('%sr[:] = %s' % (indent, registers))
+    lines.append('%sidiom%d(r, 0, 0, 0)' % (indent, start))
+    lines.append('%s%s= r' % (indent, registers))
+    lines.append('%sip = r%d + 1' % (indent, program.ipreg))
+
+
+def compile_dispatch(program, starts, leaders, idioms, registers, lines, indent):
+    # Binary search over the starts of the blocks
+    if len(starts) == 1:
+        lines.append('%sif ip == %d:' % (indent, starts[0]))
+        if starts[0] in idioms:
+            compile_idiom(program, starts[0], registers, lines, indent + '    ')
+        else:
+            compile_block(program, starts[0], leaders, lines, indent + '    ')
+        lines.append('%selse:' % indent)
+        lines.append('%s    break' % indent)
+        return
+    middle = len(starts) // 2
+    lines.append('%sif ip < %d:' % (indent, starts[middle]))
+    compile_dispatch(program, starts[:middle], leaders, idioms, registers, lines, indent + '    ')
+    lines.append('%selse:' % indent)
+    compile_dispatch(program, starts[middle:], leaders, idioms, registers, lines, indent + '    ')
+
+
+def python_source(program, size, idioms=(), stops=()):
+    # Stops end the blocks before them and aren't compiled, so that the
+    # function returns when it gets to one
+    exits = [exit for _, exit in idioms.values()] if idioms else []
+    extra = list(idioms) + exits + list(stops) + [stop + 1 for stop in stops]
+    leaders = find_leaders(program, extra)
+    starts = [start for start in leaders if start not in stops]
+    registers = ''.join('r%d, ' % reg for reg in range(size))
+    lines = ['def run(r, ip):',
+             '    %s= r' % registers,
+             '    while True:']
+    if starts:
+        compile_dispatch(program, starts, set(leaders), idioms, registers, lines, '        ')
+    else:
+        lines.append('        break')
+    lines.append('    r%d = ip' % program.ipreg)
+    lines.append('    r[:] = %s' % registers)
+    lines.append('    return ip')
+    return '\n'.join(lines) + '\n', starts
+
+
+_compiled = {}
+
+
+def jit(program, size=6, idioms=True, stops=()):
+    """Python function run(registers, ip) -> ip equivalent to the program.
+
+    It runs from ip (which must start a block, see run.leaders) until the
+    program halts, gets to one of the stops or jumps somewhere the compiled
+    code doesn't know about. Functions are cached by the hash of the program."""
+    stops = frozenset(stops)
+    key = (program.key(), size, idioms, stops)
+    if key not in _compiled:
+        found = find_idioms(program) if idioms else {}
+        source, starts = python_source(program, size, found, stops)
+        namespace = {'idiom%d' % start: op_fn for start, (op_fn, _) in found.items()}
+        exec(compile(source, '<elfcode %s>' % key[0][:8], 'exec'), namespace)
+        run = namespace['run']
+        run.leaders = frozenset(starts)
+        run.source = source
+        _compiled[key] = run
+    return _compiled[key]
+
+
+class Machine:
+
+    def __init__(self, program=None, registers=None, size=6):
+        self.program = program if program is not None else Program([])
+        self.registers = list(registers) if registers is not None else [0] * size
+        self._ip = 0
+        # Filled by instrumented runs: executions of each ip and the last
+        # (ip, registers before, registers after) of the run
+        self.counts = None
+        self.history = None
+
+    def load(self, fname):
+        self.program = load(fname)
+
+    @property
+    def ip(self):
+        if self.program.ipreg is None:
+            return self._ip
+        return self.registers[self.program.ipreg]
+
+    @ip.setter
+    def ip(self, value):
+        if self.program.ipreg is None:
+            self._ip = value
+        else:
+            self.registers[self.program.ipreg] = value
+
+    def halted(self):
+        return not 0 <= self.ip < len(self.program)
+
+    def step(self):
+        ip = self.ip
+        if not 0 <= ip < len(self.program):
+            return False
+        op_fn, a, b, c = self.program.decoded[ip]
+        op_fn(self.registers, a, b, c)
+        self.ip += 1
+        return True
+
+    def run(self, registers=None, do_trace=False, compiled=True, idioms=True,
+            profile=False, history=1000, watch=None):
+        """Runs until the ip leaves the program.
+
+        With do_trace the last `history` executed instructions are returned
+        formatted, and with profile a report of the most executed lines is
+        printed to stderr at the end. Both run the plain interpreter, so that
+        the counts show the loops as they are in the program.
+
+        watch maps lines to hooks called with the registers every time the
+        line is about to run; the run stops there when a hook returns True."""
+        if registers:
+            self.registers = list(registers)
+        if do_trace or profile:
+            self._run_instrumented(history)
+            if profile:
+                print(self.hotspots(), file=sys.stderr)
+            return self.trace() if do_trace else []
+
+        watch = watch or {}
+        if watch and idioms and any(start < line < exit for line in watch
+                                    for start, (_, exit) in find_idioms(self.program).items()):
+            # The line would be skipped by a superinstruction
+            idioms = False
+
+        r = self.registers
+        ipreg = self.program.ipreg
+        decoded = optimized(self.program) if idioms and ipreg is not None else self.program.decoded
+        size = len(decoded)
+
+        if ipreg is None:
+            ip = self._ip
+            while 0 <= ip < size:
+                if ip in watch and watch[ip](r):
+                    break
+                op_fn, a, b, c = decoded[ip]
+                op_fn(r, a, b, c)
+                ip += 1
+            self._ip = ip
+            return []
+
+        if compiled:
+            function = jit(self.program, len(r), idioms, watch)
+            leaders = function.leaders
+        else:
+            function, leaders = None, ()
+
+        ip = r[ipreg]
+        while 0 <= ip < size:
+            if ip in leaders:
+                ip = function(r, ip)
+                continue
+            r[ipreg] = ip
+            if ip in watch and watch[ip](r):
+                break
+            op_fn, a, b, c = decoded[ip]
+            op_fn(r, a, b, c)
+            ip = r[ipreg] + 1
+        r[ipreg] = ip
+        return []
+
+    def _run_instrumented(self, history):
+        decoded = self.program.decoded
+        size = len(decoded)
+        counts = array.array('Q', [0]) * size
+        recent = collections.deque(maxlen=history)
+        r = self.registers
+        ip = self.ip
+        while 0 <= ip < size:
+            self.ip = ip
+            before = tuple(r)
+            op_fn, a, b, c = decoded[ip]
+            op_fn(r, a, b, c)
+            counts[ip] += 1
+            recent.append((ip, before, tuple(r)))
+            ip = self.ip + 1
+        self.ip = ip
+        self.counts = counts
+        self.history = recent
+
+    def trace(self):
+        return ['ip=%d %s %s %s' % (ip, list(before), show(self.program[ip]), list(after))
+                for ip, before, after in self.history]
+
+    def hotspots(self, top=10):
+        total = sum(self.counts)
+        lines = ['%d instructions executed, most executed lines:' % total,
+                 '  line        count       %  disassembly']
+        hottest = sorted(range(len(self.counts)), key=lambda ip: -self.counts[ip])[:top]
+        for ip in sorted(hottest):
+            if self.counts[ip]:
+                lines.append('  %4d %12d  %5.1f%%  %s' % (
+                    ip, self.counts[ip], 100 * self.counts[ip] / total,
+                    disassemble(self.program[ip], ip, self.program.ipreg)))
+        return '\n'.join(lines)
+
+
+def test_ops():
+    expected = {'addr': 10 + 20, 'addi': 10 + 2, 'mulr': 10 * 20, 'muli': 10 * 2,
+                'banr': 10 & 20, 'bani': 10 & 2, 'borr': 10 | 20, 'bori': 10 | 2,
+                'setr': 10, 'seti': 1,
+                'gtir': 0, 'gtri': 1, 'gtrr': 0,
+                'eqir': 0, 'eqri': 0, 'eqrr': 0}
+    for opname, value in expected.items():
+        registers = [0, 10, 20, 40]
+        OPS[opname](registers, 1, 2, 3)
+        assert [0, 10, 20, value] == registers
+
+
+def test_parse_program():
+    program = parse_program(['#ip 0', 'seti 5 0 1', 'addi 0 1 0'])
+    assert 0 == program.ipreg
+    assert 2 == len(program)
+    assert Instruction('addi', 0, 1, 0) == program[1]
+    assert [Instruction('seti', 5, 0, 1), Instruction('addi', 0, 1, 0)] == list(program)
+
+
+def test_program_key():
+    program1 = parse_program(['#ip 0', 'seti 5 0 1'])
+    program2 = parse_program(['#ip 1', 'seti 5 0 1'])
+    assert program1.key() != program2.key()
+    assert program1.key() == parse_program(['#ip 0', 'seti 5 0 1']).key()
+
+
+def test_step():
+    machine = Machine(parse_program(['#ip 0', 'seti 5 0 1', 'addi 0 1 0', 'seti 7 0 2']))
+    assert machine.step()
+    assert [1, 5, 0, 0, 0, 0] == machine.registers
+    assert machine.step()
+    assert 3 == machine.ip
+    assert not machine.step()
+    assert machine.halted()
+
+
+def test_run_without_ip():
+    machine = Machine(parse_program(['seti 3 0 0', 'muli 0 4 1', 'addr 0 1 2']), size=4)
+    machine.run()
+    assert [3, 12, 15, 0] == machine.registers
+    assert machine.halted()
+
+
+def test_find_leaders():
+    # day19's test program: 'addi 0 1 0' jumps to 4, but where 'setr 1 0 0'
+    # jumps depends on r[1]
+    program = parse_program(['#ip 0', 'seti 5 0 1', 'seti 6 0 2', 'addi 0 1 0',
+                             'addr 1 2 3', 'setr 1 0 0', 'seti 8 0 4', 'seti 9 0 5'])
+    assert [0, 3, 4, 5] == find_leaders(program)
+
+
+def test_conditional_jump_targets():
+    program = parse_program(['#ip 5', 'eqri 0 3 1', 'addr 1 5 5', 'addi 2 1 2', 'seti 7 0 3'])
+    assert [0, 2, 3] == find_leaders(program)
+    program = parse_program(['#ip 5', 'addi 2 1 2', 'addr 0 5 5', 'addi 2 1 2', 'seti 7 0 3'])
+    assert None is jump_targets(program, 1, {0, 2})
+
+
+def test_compiled_run():
+    # Counts down r0, adding it to r1, with data dependent jumps
+    lines = ['#ip 4', 'seti 10 0 0', 'addr 1 0 1', 'addi 0 -1 0', 'gtri 0 0 2',
+             'addr 4 2 4', 'seti 9 0 4', 'seti 0 0 4', 'addi 4 1 4', 'seti 1 0 4']
+    for registers in ([0] * 5, [0, 0, 0, 0, 2], [0, 0, 0, 0, 7]):
+        interpreted = Machine(parse_program(lines), registers, size=5)
+        interpreted.run(compiled=False)
+        compiled = Machine(parse_program(lines), registers, size=5)
+        compiled.run()
+        assert interpreted.registers == compiled.registers
+
+
+def test_jit_cache():
+    program = parse_program(['#ip 1', 'seti 5 0 0'])
+    assert jit(program) is jit(parse_program(['#ip 1', 'seti 5 0 0']))
+    assert jit(program) is not jit(program, 4)
+
+
+# The loop of day19's input, summing the divisors of r[1]
+DIVISOR_SUM_PROGRAM = ['#ip 2', 'seti 20 0 1',
+                       'seti 1 8 3', 'seti 1 5 5', 'mulr 3 5 4', 'eqrr 4 1 4', 'addr 4 2 2',
+                       'addi 2 1 2', 'addr 3 0 0', 'addi 5 1 5', 'gtrr 5 1 4', 'addr 2 4 2',
+                       'seti 2 6 2', 'addi 3 1 3', 'gtrr 3 1 4', 'addr 4 2 2', 'seti 1 1 2',
+                       'mulr 2 2 2']
+
+# The loop of day21's input, dividing r[1] by 256
+DIVISION_PROGRAM = ['#ip 2', 'seti 1000 0 1',
+                    'seti 0 0 4', 'addi 4 1 3', 'muli 3 256 3', 'gtrr 3 1 3', 'addr 3 2 2',
+                    'addi 2 1 2', 'seti 9 0 2', 'addi 4 1 4', 'seti 1 0 2']
+
+
+def test_sum_of_divisors():
+    assert 1 == sum_of_divisors(1)
+    assert 42 == sum_of_divisors(20)
+    assert 17427456 == sum_of_divisors(10551315)
+
+
+def test_match_idioms():
+    program = parse_program(DIVISOR_SUM_PROGRAM)
+    assert {'i': 3, 'j': 5, 't': 4, 'n': 1, 's': 0} == match(IDIOMS[0], program, 1)
+    assert None is match(IDIOMS[0], program, 0)
+    program = parse_program(DIVISION_PROGRAM)
+    assert {'q': 4, 't': 3, 'K': 256, 'n': 1} == match(IDIOMS[1], program, 1)
+    assert [1] == list(find_idioms(program))
+    assert find_idioms(program) is find_idioms(parse_program(DIVISION_PROGRAM))
+
+
+def test_idioms_are_verified():
+    program = parse_program(DIVISION_PROGRAM)
+    bindings = match(IDIOMS[1], program, 1)
+    assert verify(program, IDIOMS[1], bindings, 1)
+
+    def rounding_up(r, v):
+        r[v['q']] = -(-r[v['n']] // v['K'])
+        r[v['t']] = 1
+    assert not verify(program, IDIOMS[1]._replace(effect=rounding_up), bindings, 1)
+
+
+def test_run_idioms():
+    for lines in (DIVISOR_SUM_PROGRAM, DIVISION_PROGRAM):
+        for compiled in (False, True):
+            slow = Machine(parse_program(lines))
+            slow.run(compiled=compiled, idioms=False)
+            fast = Machine(parse_program(lines))
+            fast.run(compiled=compiled)
+            assert slow.registers == fast.registers
+
+
+def test_disassemble():
+    assert 'jump #17' == disassemble(Instruction('addi', 2, 16, 2), 0, 2)
+    assert 'jump r[4] + 6' == disassemble(Instruction('addr', 4, 2, 2), 5, 2)
+    assert 'r[4] = 1 if r[5] > r[1] else 0' == disassemble(Instruction('gtrr', 5, 1, 4), 9, 2)
+    assert 'r[1] = r[1] * 19' == disassemble(Instruction('mulr', 2, 1, 1), 19, 2)
+
+
+def test_profile(capsys):
+    machine = Machine(parse_program(DIVISION_PROGRAM))
+    machine.run(profile=True, history=5)
+    assert [1, 1, 4, 4, 4, 4, 3, 1, 3, 3] == list(machine.counts)
+    assert 5 == len(machine.history)
+    ip, _, after = machine.history[-1]
+    assert (7, machine.registers[:2]) == (ip, list(after[:2]))
+    report = capsys.readouterr().err
+    assert '28 instructions executed' in report
+    assert '     2            4   14.3%  r[3] = r[4] + 1' in report
+
+
+def test_watch():
+    # Counts r1 down from 5 to 0, stopping at 2
+    program = parse_program(['#ip 2', 'seti 5 0 1', 'addi 1 -1 1', 'gtri 1 0 3',
+                             'addr 3 2 2', 'seti 10 0 2', 'seti 0 0 2'])
+    for compiled in (True, False):
+        seen = []
+
+        def check(r):
+            seen.append(r[1])
+            return r[1] == 2
+        machine = Machine(program)
+        machine.run(compiled=compiled, watch={1: check})
+        assert [5, 4, 3, 2] == seen
+        assert (1, 2) == (machine.ip, machine.registers[1])
+
+
+def test_watch_inside_idiom():
+    machine = Machine(parse_program(DIVISION_PROGRAM))
+    machine.run(watch={3: lambda r: True})
+    assert 3 == machine.ip
+
+
+def test_set_ip():
+    machine = Machine(parse_program(['#ip 0', 'seti 5 0 1', 'seti 6 0 2']))
+    machine.ip = 1
+    machine.run()
+    assert [2, 0, 6, 0, 0, 0] == machine.registers
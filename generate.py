@@ -0,0 +1,565 @@
+# Synthetic inputs of any size in the format of each day, to see how the
+# solvers scale and not just whether they are right.
+#
+#   python generate.py day3 1000000 -o ../data/day3-big.txt [--seed 1]
+#
+# Every generator takes the size (what it means depends on the day: lines,
+# units of polymer, side of a map...) and a random.Random, and yields the
+# lines of the input. Where a part needs something to exist to have an
+# answer (two boxes differing in one letter, a claim that overlaps nothing)
+# it is planted in the random data.
+#
+# Days 9, 11, 14 and 22 take a few numbers rather than an input file, and
+# days 19 and 21 are about reverse engineering one particular program,
+# which a random one wouldn't be, so they have no generator.
+
+import argparse
+import datetime
+import random
+import string
+
+import elfcode
+
+
+def day1(size, rng):
+    # Frequency changes, drifting upwards by 10000 a change on average so
+    # that every pass through them ends higher than the previous one
+    for _ in range(size):
+        change = rng.randint(-90000, 110000)
+        yield '%+d' % change if change else '+1'
+
+
+def day2(size, rng):
+    # Box ids, with exactly one pair differing in one letter
+    if size < 2:
+        raise ValueError('day2 needs at least 2 box ids for the pair')
+    letters = string.ascii_lowercase
+    seen = set()
+    while len(seen) < size - 1:
+        seen.add(''.join(rng.choice(letters) for _ in range(26)))
+    boxes = list(seen)
+    box = boxes[rng.randrange(len(boxes))]
+    pos = rng.randrange(26)
+    twin = box[:pos] + rng.choice(letters.replace(box[pos], '')) + box[pos + 1:]
+    boxes.insert(rng.randrange(len(boxes) + 1), twin)
+    for box in boxes:
+        yield box
+
+
+def day3(size, rng):
+    # Claims over a fabric that grows with them, in overlapping pairs, and
+    # one claim on its own to the right of the rest
+    if size < 3:
+        raise ValueError('day3 needs at least 3 claims: a pair and one on its own')
+    side = max(1000, int(30 * size ** 0.5))
+    lonely = rng.randrange(1, size + 1)
+    paired = 0
+    for claim in range(1, size + 1):
+        w, h = rng.randint(1, 30), rng.randint(1, 30)
+        if claim == lonely:
+            yield '#%d @ %d,%d: %dx%d' % (claim, side + 10, rng.randrange(side), w, h)
+            continue
+        last = claim == size or claim + 1 == lonely == size
+        if paired % 2 == 0 and not last:
+            x, y = rng.randrange(side - w), rng.randrange(side - h)
+        else:
+            # Overlaps the previous claim
+            x = rng.randint(max(0, px - w + 1), min(side - w, px + pw - 1))
+            y = rng.randint(max(0, py - h + 1), min(side - h, py + ph - 1))
+        px, py, pw, ph = x, y, w, h
+        paired += 1
+        yield '#%d @ %d,%d: %dx%d' % (claim, x, y, w, h)
+
+
+def day4(size, rng):
+    # Shifts of the guards, in no particular order
+    guards = [rng.randrange(10, 4000) for _ in range(max(2, size // 20))]
+    lines = []
+    first = datetime.date(1518, 1, 1)
+    for shift in range(size):
+        date = (first + datetime.timedelta(days=shift)).isoformat()
+        lines.append('[%s 00:00] Guard #%d begins shift' % (date, rng.choice(guards)))
+        minute = 0
+        while True:
+            falls = rng.randint(minute + 1, minute + 30)
+            wakes = rng.randint(falls + 1, falls + 30)
+            if wakes >= 60:
+                break
+            lines.append('[%s 00:%02d] falls asleep' % (date, falls))
+            lines.append('[%s 00:%02d] wakes up' % (date, wakes))
+            minute = wakes
+    rng.shuffle(lines)
+    return lines
+
+
+def day5(size, rng):
+    # A polymer of size units, in a single line
+    units = string.ascii_letters
+    yield ''.join(rng.choice(units) for _ in range(size))
+
+
+def day6(size, rng):
+    # Coordinates spread over a square that grows with them
+    side = max(400, int(40 * size ** 0.5))
+    for _ in range(size):
+        yield '%d, %d' % (rng.randrange(side), rng.randrange(side))
+
+
+def day7(size, rng):
+    # Size dependencies between the 26 steps, all of them respecting a
+    # random order of the steps so that there are no cycles
+    order = rng.sample(string.ascii_uppercase, 26)
+    pairs = [(before, after) for idx, before in enumerate(order) for after in order[idx + 1:]]
+    if size > len(pairs):
+        raise ValueError('day7 has at most %d dependencies between 26 steps' % len(pairs))
+    for before, after in rng.sample(pairs, size):
+        yield 'Step %s must be finished before step %s can begin.' % (before, after)
+
+
+def day8(size, rng, branching=3):
+    # A tree of size nodes, in a single line. Every node hangs from one of
+    # the `branching` nodes before it, so small values make deep trees
+    children = [[] for _ in range(size)]
+    for node in range(1, size):
+        children[rng.randrange(max(0, node - branching), node)].append(node)
+    numbers = []
+    stack = [(0, False)]
+    while stack:
+        node, visited = stack.pop()
+        if visited:
+            numbers.extend(rng.randint(1, 99) for _ in range(metadata[node]))
+            continue
+        if node == 0:
+            metadata = [rng.randint(1, 5) for _ in range(size)]
+        numbers.extend((len(children[node]), metadata[node]))
+        stack.append((node, True))
+        stack.extend((child, False) for child in reversed(children[node]))
+    yield ' '.join(map(str, numbers))
+
+
+def day10(size, rng):
+    # Points that line up at some second into a random pattern
+    second = rng.randint(1000, 20000)
+    for _ in range(size):
+        x, y = rng.randrange(80), rng.randrange(10)
+        vx, vy = rng.randint(-5, 5), rng.randint(-5, 5)
+        yield 'position=<%6d, %6d> velocity=<%2d, %2d>' % (x - vx * second, y - vy * second,
+                                                           vx, vy)
+
+
+def day12(size, rng):
+    # An initial state of size pots and a rule for every pattern
+    yield 'initial state: ' + ''.join(rng.choice('#.') for _ in range(size))
+    yield ''
+    for pattern in range(32):
+        pots = ''.join('#' if pattern & (1 << bit) else '.' for bit in range(5))
+        # Empty pots stay empty, or the plants would fill infinite space
+        yield '%s => %s' % (pots, '.' if pots == '.....' else rng.choice('#.'))
+
+
+def day13(size, rng):
+    # Loops of track over a size x size map, crossing each other. No two
+    # loops share a row or a column for their sides, so they only meet at
+    # crossings. Carts go in pairs facing each other on a stretch of track
+    # between corners and crossings, closer to each other than to its
+    # ends: every pair crashes before anything else can get in between,
+    # and a last cart on its own is left for part 2
+    if size < 20:
+        raise ValueError('day13 needs a map of at least 20 x 20')
+    rows, columns = list(range(size)), list(range(size))
+    rng.shuffle(rows)
+    rng.shuffle(columns)
+    loops = []
+    while len(rows) >= 2 and len(columns) >= 2 and len(loops) < size // 4:
+        (y1, y2), (x1, x2) = sorted(rows[-2:]), sorted(columns[-2:])
+        del rows[-2:], columns[-2:]
+        if y2 - y1 >= 3 and x2 - x1 >= 3:
+            loops.append((x1, y1, x2, y2))
+    grid = [[' '] * size for _ in range(size)]
+    for x1, y1, x2, y2 in loops:
+        for x in range(x1 + 1, x2):
+            grid[y1][x] = grid[y2][x] = '-'
+    for x1, y1, x2, y2 in loops:
+        for y in range(y1 + 1, y2):
+            for x in (x1, x2):
+                grid[y][x] = '+' if grid[y][x] == '-' else '|'
+        grid[y1][x1] = grid[y2][x2] = '/'
+        grid[y1][x2] = grid[y2][x1] = '\\'
+    # Stretches of the top and bottom sides, from first to last cell
+    stretches = []
+    for x1, y1, x2, y2 in loops:
+        for y in (y1, y2):
+            start = x1 + 1
+            for x in range(x1 + 1, x2 + 1):
+                if grid[y][x] != '-':
+                    if x - start >= 4:
+                        stretches.append((y, start, x - 1))
+                    start = x + 1
+    rng.shuffle(stretches)
+    if len(stretches) < 2:
+        # Too few or too small loops for the carts, unlikely but for tiny maps
+        yield from day13(size, rng)
+        return
+    y, start, end = stretches.pop()
+    grid[y][rng.randint(start, end)] = rng.choice('<>')
+    for y, start, end in stretches[:rng.randint(1, len(stretches))]:
+        # Farther from the ends than from each other
+        gap = rng.randint(1, (end - start) // 3)
+        left = rng.randint(start + gap, end - 2 * gap)
+        grid[y][left], grid[y][left + gap] = '>', '<'
+    for row in grid:
+        yield ''.join(row)
+
+
+def day15(size, rng):
+    # A cave of size x size with some inner walls, elves and goblins
+    yield '#' * size
+    for _ in range(size - 2):
+        row = ''.join(rng.choices('.#GE', weights=(80, 16, 2, 2), k=size - 2))
+        yield '#' + row + '#'
+    yield '#' * size
+
+
+def day16(size, rng):
+    # Size samples of the opcodes and a program of size instructions.
+    # day16 joins the candidates of all the samples of an opcode and then
+    # fixes the opcodes with a single candidate left, one after another,
+    # so the opcodes get an order and the samples of each one only match
+    # it and the ones before: that is always solvable
+    opnames = list(elfcode.OPNAMES)
+    opcodes = dict(zip(opnames, rng.sample(range(16), 16)))
+
+    def sample(opname):
+        before = [rng.randrange(4) for _ in range(4)]
+        a, b, c = rng.randrange(4), rng.randrange(4), rng.randrange(4)
+        after = before[:]
+        elfcode.OPS[opname](after, a, b, c)
+        matching = set()
+        for other, op_fn in elfcode.OPS.items():
+            registers = before[:]
+            op_fn(registers, a, b, c)
+            if registers == after:
+                matching.add(other)
+        return matching, (before, (opcodes[opname], a, b, c), after)
+
+    def sample_within(opname, allowed, tries=1000):
+        for _ in range(tries):
+            matching, found = sample(opname)
+            if matching <= allowed:
+                return found
+
+    order, samples = [], []
+    while len(order) < 16:
+        for opname in rng.sample([op for op in opnames if op not in order], 16 - len(order)):
+            found = sample_within(opname, set(order) | {opname})
+            if found:
+                order.append(opname)
+                samples.append(found)
+                break
+        else:
+            raise ValueError('no order of the opcodes found, try another seed')
+    while len(samples) < size:
+        idx = rng.randrange(16)
+        found = sample_within(order[idx], set(order[:idx + 1]))
+        if found:
+            samples.append(found)
+    rng.shuffle(samples)
+    for before, op, after in samples:
+        yield 'Before: %s' % before
+        yield '%d %d %d %d' % op
+        yield 'After:  %s' % after
+        yield ''
+    yield ''
+    yield ''
+    # Multiplying registers together would make numbers explode
+    program = [op for op in opnames if op != 'mulr']
+    for _ in range(size):
+        opname = rng.choice(program)
+        b = rng.randrange(4) if opname.endswith('r') else rng.randrange(1, 20)
+        yield '%d %d %d %d' % (opcodes[opname], rng.randrange(4), b, rng.randrange(4))
+
+
+def day17(size, rng):
+    # Size veins of clay under the spring at x=500
+    for _ in range(size):
+        x, y = rng.randint(500 - size, 500 + size), rng.randint(1, 10 * size)
+        length = rng.randint(1, 20)
+        if rng.random() < 0.5:
+            yield 'x=%d, y=%d..%d' % (x, y, y + length)
+        else:
+            yield 'y=%d, x=%d..%d' % (y, x, x + length)
+
+
+def day18(size, rng):
+    # A size x size lumber collection area
+    for _ in range(size):
+        yield ''.join(rng.choice('.|#') for _ in range(size))
+
+
+def day20(size, rng):
+    # The regexp of a maze of about size rooms: a tree dug through a square
+    # of rooms depth first, which makes the long corridors of the real
+    # ones. Branches only come at the end of the path leading to them
+    side = max(2, int(size ** 0.5))
+    moves = {'N': (0, -1), 'E': (1, 0), 'S': (0, 1), 'W': (-1, 0)}
+    children = {(0, 0): []}
+    stack = [(0, 0)]
+    while stack:
+        x, y = stack[-1]
+        unvisited = [(door, (x + dx, y + dy)) for door, (dx, dy) in moves.items()
+                     if 0 <= x + dx < side and 0 <= y + dy < side
+                     and (x + dx, y + dy) not in children]
+        if not unvisited:
+            stack.pop()
+            continue
+        door, room = rng.choice(unvisited)
+        children[(x, y)].append((door, room))
+        children[room] = []
+        stack.append(room)
+    # Written without recursion, the tree is too deep
+    parts = []
+    pending = [(0, 0)]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, str):
+            parts.append(item)
+            continue
+        doors = children[item]
+        if len(doors) == 1:
+            door, room = doors[0]
+            pending.extend((room, door))
+        elif doors:
+            pending.append(')')
+            for nth, (door, room) in enumerate(reversed(doors)):
+                pending.extend((room, door, '|') if nth < len(doors) - 1 else (room, door))
+            pending.append('(')
+    yield '^%s$' % ''.join(parts)
+
+
+def day23(size, rng):
+    # Nanobots with big ranges, so that many of them are in range of each other
+    for _ in range(size):
+        x, y, z = (rng.randint(-10 ** 8, 10 ** 8) for _ in range(3))
+        yield 'pos=<%d,%d,%d>, r=%d' % (x, y, z, rng.randint(5 * 10 ** 7, 10 ** 8))
+
+
+def day24(size, rng):
+    # Size groups in each army. Any attack kills a unit at least (units
+    # hit harder than any unit can take, and are only immune to attack
+    # types of their own army), so battles never stall. The immune system
+    # has too many units to lose a group in a round, so with a big enough
+    # boost it kills every infection group in the first round and part 2
+    # ends
+    kinds = ['bludgeoning', 'cold', 'fire', 'radiation', 'slashing']
+    rng.shuffle(kinds)
+    initiatives = rng.sample(range(1, 2 * size + 1), 2 * size)
+    armies = (('Immune System', kinds[:3], kinds[3:], (4001, 8000)),
+              ('Infection', kinds[3:], kinds[:3], (1, 100)))
+    for army, (name, attacks, defenses, quantities) in enumerate(armies):
+        if army:
+            yield ''
+        yield '%s:' % name
+        for group in range(size):
+            immunities = rng.sample(attacks, rng.randint(0, 1))
+            weaknesses = rng.sample(defenses, rng.randint(0, 2))
+            traits = []
+            if immunities:
+                traits.append('immune to ' + ', '.join(immunities))
+            if weaknesses:
+                traits.append('weak to ' + ', '.join(weaknesses))
+            rng.shuffle(traits)
+            yield '%d units each with %d hit points %swith an attack that does %d %s damage ' \
+                  'at initiative %d' % (rng.randint(*quantities), rng.randint(100, 1000),
+                                        '(%s) ' % '; '.join(traits) if traits else '',
+                                        rng.randint(1000, 2000), rng.choice(attacks),
+                                        initiatives[army * size + group])
+
+
+def day25(size, rng):
+    # Points in four dimensions, close enough to make constellations
+    for _ in range(size):
+        yield ','.join(str(rng.randint(-8, 8)) for _ in range(4))
+
+
+GENERATORS = {name: function for name, function in globals().items()
+              if name.startswith('day') and callable(function)}
+
+
+def generate(day, size, seed=0):
+    """The lines of a synthetic input of the given day."""
+    return GENERATORS[day](size, random.Random(seed))
+
+
+def write(day, size, fname, seed=0):
+    with open(fname, 'w') as out:
+        for line in generate(day, size, seed):
+            out.write(line)
+            out.write('\n')
+
+
+def test_generators_are_deterministic():
+    for day in GENERATORS:
+        assert list(generate(day, 20, seed=3)) == list(generate(day, 20, seed=3))
+
+
+def test_day1():
+    changes = [int(line) for line in generate('day1', 1000)]
+    assert 1000 == len(changes) and 0 not in changes
+    assert sum(changes) > 0
+
+
+def test_small_sizes():
+    import pytest
+    assert 2 == len(list(generate('day2', 2)))
+    assert 3 == len(list(generate('day3', 3)))
+    for day, size in (('day2', 1), ('day3', 2)):
+        with pytest.raises(ValueError):
+            list(generate(day, size))
+
+
+def test_day2():
+    boxes = list(generate('day2', 500))
+    assert 500 == len(set(boxes))
+    pairs = [(box1, box2) for idx, box1 in enumerate(boxes) for box2 in boxes[idx + 1:]
+             if sum(c1 != c2 for c1, c2 in zip(box1, box2)) == 1]
+    assert 1 == len(pairs)
+
+
+def test_day3():
+    import re
+    regexp = re.compile(r'^#(\d+) @ (\d+),(\d+): (\d+)x(\d+)$')
+    claims = [tuple(map(int, regexp.match(line).groups())) for line in generate('day3', 300, seed=1)]
+    squares = {}
+    for claim, x, y, w, h in claims:
+        for xx in range(x, x + w):
+            for yy in range(y, y + h):
+                squares.setdefault((xx, yy), set()).add(claim)
+    overlapping = set().union(*(ids for ids in squares.values() if len(ids) > 1))
+    assert 1 == len({claim for claim, *_ in claims} - overlapping)
+
+
+def test_day4():
+    lines = sorted(generate('day4', 50))
+    assert 50 == sum('Guard' in line for line in lines)
+    assert sum('falls' in line for line in lines) == sum('wakes' in line for line in lines)
+    # Real dates, across the ends of the months and years
+    dates = [datetime.date.fromisoformat(line[1:11]) for line in generate('day4', 400)]
+    assert datetime.date(1519, 2, 4) == max(dates)
+
+
+def test_day7():
+    import pytest
+    lines = list(generate('day7', 100))
+    assert 100 == len(set(lines))
+    # Steps can be finished in some order
+    pending = [line.split()[1::6] for line in lines]
+    done = set()
+    while pending:
+        waiting = {after for _, after in pending}
+        done |= {before for before, _ in pending if before not in waiting}
+        left = [(before, after) for before, after in pending if before not in done]
+        assert len(left) < len(pending)
+        pending = left
+    with pytest.raises(ValueError):
+        list(generate('day7', 326))
+
+
+def test_day8():
+    numbers = list(map(int, next(generate('day8', 2000, seed=1)).split()))
+    # Reads the tree back without recursion, checking its depth
+    depth, deepest, stack, idx = 0, 0, [], 0
+    nodes = 0
+    while True:
+        if not stack or stack[-1][0] > 0:
+            if stack:
+                stack[-1][0] -= 1
+            stack.append([numbers[idx], numbers[idx + 1]])
+            idx += 2
+            nodes += 1
+            deepest = max(deepest, len(stack))
+        else:
+            _, metadata = stack.pop()
+            idx += metadata
+            if not stack:
+                break
+    assert (2000, len(numbers)) == (nodes, idx)
+    assert deepest > 100
+
+
+def test_day13():
+    tracks = list(generate('day13', 60, seed=2))
+    assert 60 == len(tracks) and {60} == {len(row) for row in tracks}
+    carts = ''.join(tracks).count('>') + ''.join(tracks).count('<')
+    assert carts % 2 == 1 and carts >= 3
+
+
+def test_day16():
+    import re
+    lines = list(generate('day16', 300, seed=1))
+    samples = [(eval(lines[idx][8:]), list(map(int, lines[idx + 1].split())),
+                eval(lines[idx + 2][8:])) for idx in range(0, 4 * 300, 4)]
+    assert ['', '', ''] == lines[1199:1202]
+    program = lines[1202:]
+    assert 300 == len(program) and all(re.match(r'^\d+ \d \d+ \d$', line) for line in program)
+    # Joining the candidates of every opcode and fixing the single ones
+    # finds all of them, as day16 does
+    candidates = {}
+    for before, (opcode, a, b, c), after in samples:
+        for opname, op_fn in elfcode.OPS.items():
+            registers = before[:]
+            op_fn(registers, a, b, c)
+            if registers == after:
+                candidates.setdefault(opcode, set()).add(opname)
+    found = {}
+    while len(found) < 16:
+        fixed = set(found.values())
+        single = {opcode: ops - fixed for opcode, ops in candidates.items()
+                  if opcode not in found and len(ops - fixed) == 1}
+        assert single
+        found.update((opcode, ops.pop()) for opcode, ops in single.items())
+    for before, (opcode, a, b, c), after in samples:
+        registers = before[:]
+        elfcode.OPS[found[opcode]](registers, a, b, c)
+        assert after == registers
+
+
+def test_day15():
+    cave = list(generate('day15', 30))
+    assert 30 == len(cave) and {30} == {len(row) for row in cave}
+    assert set(''.join(cave)) <= set('#.GE')
+
+
+def test_day20():
+    regexp = next(generate('day20', 400, seed=1))
+    assert regexp[0] == '^' and regexp[-1] == '$'
+    # A door to every room of the 20 x 20 square but the first
+    assert 399 == sum(regexp.count(door) for door in 'NESW')
+    depth = 0
+    for c in regexp:
+        depth += {'(': 1, ')': -1}.get(c, 0)
+        assert depth >= 0
+    assert 0 == depth
+
+
+def test_day24():
+    import re
+    regexp = re.compile(r'^(\d+) units each with (\d+) hit points (\(.+\) )?with an attack '
+                        r'that does (\d+) (\w+) damage at initiative (\d+)$')
+    lines = list(generate('day24', 10, seed=3))
+    assert ['Immune System:', '', 'Infection:'] == [lines[0], lines[11], lines[12]]
+    groups = [regexp.match(line).groups() for line in lines[1:11] + lines[13:]]
+    assert list(range(1, 21)) == sorted(int(group[5]) for group in groups)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic input')
+    parser.add_argument('day', choices=sorted(GENERATORS, key=lambda day: int(day[3:])))
+    parser.add_argument('size', type=int)
+    parser.add_argument('-o', '--output', help='file to write, stdout by default')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if args.output:
+        write(args.day, args.size, args.output, args.seed)
+    else:
+        for line in generate(args.day, args.size, args.seed):
+            print(line)
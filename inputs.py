@@ -0,0 +1,220 @@
+# Parsed inputs, cached in binary form next to the input files.
+#
+# A day parses its input once into rows of integers; they are written to
+# .cache/<name>-<parser>-<hash>.bin (the hash covers the contents of the
+# file and the source of the module defining the parser, so that editing
+# the parser or any helper or regexp next to it parses again, and the
+# files of older versions are removed) and later loads just map that file
+# in memory.
+#
+#   claims = load('../data/day3-input.txt', parse_claims, width=5)
+#   len(claims), claims[0]               # rows are tuples of ints
+#   claims.column(1)                     # memoryview of the x's
+#   numpy.frombuffer(claims.values, ...) # the flat values, without copying
+
+import array
+import glob
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+CACHE = '.cache'
+
+# Type code of the values and width of the rows
+HEADER = struct.Struct('<c3xI')
+
+
+class Table:
+    """Rows of `width` integers over a flat memoryview of the values."""
+
+    def __init__(self, values, width, buffer=None):
+        self.values = values
+        self.width = width
+        # The mmap behind values, kept alive with them
+        self._buffer = buffer
+
+    def __len__(self):
+        return len(self.values) // self.width
+
+    def __getitem__(self, row):
+        if not -len(self) <= row < len(self):
+            raise IndexError(row)
+        row %= len(self)
+        if self.width == 1:
+            return self.values[row]
+        return tuple(self.values[row * self.width:(row + 1) * self.width])
+
+    def __iter__(self):
+        if self.width == 1:
+            return iter(self.values)
+        return (self[row] for row in range(len(self)))
+
+    def column(self, index):
+        return self.values[index::self.width]
+
+
+def key(fname, parse, width, typecode):
+    digest = hashlib.sha1()
+    with open(fname, 'rb') as data:
+        for chunk in iter(lambda: data.read(1 << 20), b''):
+            digest.update(chunk)
+    # A change to the parser invalidates what it parsed before
+    digest.update(parser_source(parse))
+    digest.update(('%s %d %s' % (parse.__qualname__, width, typecode)).encode())
+    return digest.hexdigest()[:16]
+
+
+def parser_source(parse):
+    # The whole module: the parser's own code doesn't tell when the
+    # functions and globals it uses change
+    # (from the code: modules loaded by benchmark aren't in sys.modules)
+    source = parse.__code__.co_filename
+    if os.path.exists(source):
+        with open(source, 'rb') as code:
+            return code.read()
+    code = parse.__code__
+    return code.co_code + repr(code.co_consts).encode()
+
+
+def cache_prefix(fname, parse):
+    # What the cache files of the input parsed by parse start with
+    folder, name = os.path.split(fname)
+    name, _ = os.path.splitext(name)
+    return os.path.join(folder, CACHE, '%s-%s-' % (name, parse.__name__))
+
+
+def cache_file(fname, parse, width=1, typecode='q'):
+    return '%s%s.bin' % (cache_prefix(fname, parse), key(fname, parse, width, typecode))
+
+
+def remove_stale(fname, parse, target):
+    # Earlier versions of the input or of the parser, which would pile up
+    # with every edit
+    for stale in glob.glob(glob.escape(cache_prefix(fname, parse)) + '*.bin'):
+        if stale != target:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+
+
+def store(fname, target, parse, width, typecode):
+    with open(fname, 'r') as data:
+        rows = parse([line.rstrip('\n') for line in data])
+    values = array.array(typecode)
+    for row in rows:
+        if width == 1:
+            values.append(row)
+        else:
+            if len(row) != width:
+                raise ValueError('row %r of %s should have %d values' % (row, fname, width))
+            values.extend(row)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Written aside and renamed, so that concurrent runs never see half a file
+    partial = '%s.%d' % (target, os.getpid())
+    with open(partial, 'wb') as cached:
+        cached.write(HEADER.pack(typecode.encode(), width))
+        values.tofile(cached)
+    os.replace(partial, target)
+    remove_stale(fname, parse, target)
+
+
+def load(fname, parse, width=1, typecode='q'):
+    """Table of the rows parse(lines) of fname, parsing only on a cache miss.
+
+    parse gets the lines without their newlines and returns the rows (ints
+    when width is 1, tuples of `width` ints otherwise) as values of the
+    array type code `typecode`."""
+    target = cache_file(fname, parse, width, typecode)
+    if not os.path.exists(target):
+        store(fname, target, parse, width, typecode)
+    with open(target, 'rb') as cached:
+        if os.fstat(cached.fileno()).st_size == HEADER.size:
+            return Table(memoryview(array.array(typecode)), width)
+        buffer = mmap.mmap(cached.fileno(), 0, access=mmap.ACCESS_READ)
+    stored, stored_width = HEADER.unpack_from(buffer)
+    assert (stored.decode(), stored_width) == (typecode, width)
+    return Table(memoryview(buffer)[HEADER.size:].cast(typecode), width, buffer)
+
+
+def parse_numbers(lines):
+    return [int(line) for line in lines]
+
+
+def parse_pairs(lines):
+    return [tuple(map(int, line.split(','))) for line in lines]
+
+
+def test_load(tmp_path):
+    fname = tmp_path / 'input.txt'
+    fname.write_text('1,2\n3,-4\n5,6\n')
+    table = load(str(fname), parse_pairs, width=2)
+    assert 3 == len(table)
+    assert (3, -4) == table[1]
+    assert (5, 6) == table[-1]
+    assert [(1, 2), (3, -4), (5, 6)] == list(table)
+    assert [2, -4, 6] == list(table.column(1))
+    assert [tmp_path / CACHE / ('input-parse_pairs-%s.bin' % key(str(fname), parse_pairs, 2, 'q'))] == \
+        list((tmp_path / CACHE).iterdir())
+
+
+def test_load_uses_cache(tmp_path):
+    calls = []
+
+    def parse(lines):
+        calls.append(len(lines))
+        return [int(line) for line in lines]
+    fname = tmp_path / 'input.txt'
+    fname.write_text('+1\n-2\n')
+    assert [1, -2] == list(load(str(fname), parse))
+    assert [1, -2] == list(load(str(fname), parse))
+    assert [2] == calls
+    fname.write_text('+1\n-2\n+7\n')
+    assert [1, -2, 7] == list(load(str(fname), parse))
+    assert [2, 3] == calls
+    # The cache of the previous contents is gone, other parsers' stays
+    load(str(fname), parse_numbers)
+    assert ['input-parse-', 'input-parse_numbers-'] == \
+        sorted(cached.name[:-20] for cached in (tmp_path / CACHE).iterdir())
+
+
+def test_load_helper_changes(tmp_path, monkeypatch):
+    import importlib
+    module = tmp_path / 'parsers.py'
+    source = ('def number(line):\n    return %s\n\n'
+              'def parse(lines):\n    return [number(line) for line in lines]\n')
+    module.write_text(source % 'int(line)')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    parsers = importlib.import_module('parsers')
+    fname = tmp_path / 'input.txt'
+    fname.write_text('+1\n-2\n')
+    assert [1, -2] == list(load(str(fname), parsers.parse))
+    module.write_text(source % '10 * int(line)')
+    parsers = importlib.reload(parsers)
+    assert [10, -20] == list(load(str(fname), parsers.parse))
+    del sys.modules['parsers']
+
+
+def test_load_helper_changes_in_benchmark(tmp_path):
+    # benchmark loads the days without registering them in sys.modules
+    import benchmark
+    module = tmp_path / 'day0.py'
+    source = ('import inputs\n\ndef number(line):\n    return %s\n\n'
+              'def parse(lines):\n    return [number(line) for line in lines]\n')
+    fname = tmp_path / 'input.txt'
+    fname.write_text('+1\n-2\n')
+    module.write_text(source % 'int(line)')
+    day = benchmark.load_module(str(module))
+    assert [1, -2] == list(load(str(fname), day.parse))
+    module.write_text(source % '10 * int(line)')
+    day = benchmark.load_module(str(module))
+    assert [10, -20] == list(load(str(fname), day.parse))
+    assert 1 == len(list((tmp_path / CACHE).iterdir()))
+
+
+def test_load_empty(tmp_path):
+    fname = tmp_path / 'input.txt'
+    fname.write_text('')
+    assert [] == list(load(str(fname), parse_numbers))
@@ -0,0 +1,58 @@
+# Modules imported on first use.
+#
+# numpy, scipy and z3 take from tens to hundreds of milliseconds to import,
+# which every run of a day (and every test collection) paid even when only
+# the pure Python parts were used:
+#
+#   numpy = lazy_import('numpy')
+#   hc = lazy_import('scipy.cluster.hierarchy')
+#   numpy.array(...)                     # numpy gets imported here
+#
+# A package that isn't installed is still reported at import time, as a
+# plain import would.
+
+import importlib
+import importlib.util
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+
+    def __getattr__(self, attr):
+        # Only called for the attributes not copied yet
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    # Looking up the top level package doesn't run any of its code
+    package = name.partition('.')[0]
+    if importlib.util.find_spec(package) is None:
+        raise ModuleNotFoundError('No module named %r' % package, name=package)
+    return LazyModule(name)
+
+
+def test_lazy_import(tmp_path, monkeypatch):
+    (tmp_path / 'slow_package').mkdir()
+    (tmp_path / 'slow_package' / '__init__.py').write_text('')
+    (tmp_path / 'slow_package' / 'slow.py').write_text('ANSWER = 42\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    slow = lazy_import('slow_package.slow')
+    assert 'slow_package.slow' not in sys.modules
+    assert 42 == slow.ANSWER
+    assert 'slow_package.slow' in sys.modules
+    assert sys.modules['slow_package.slow'] is lazy_import('slow_package.slow')
+    del sys.modules['slow_package.slow'], sys.modules['slow_package']
+
+
+def test_lazy_import_missing():
+    try:
+        lazy_import('no_such_package.module')
+    except ModuleNotFoundError as e:
+        assert 'no_such_package' == e.name
+    else:
+        assert False